@@ -6,7 +6,6 @@ add_files = [
   ('./models/embedding', './models/embedding'),
   ('./models/segmentation', './models/segmentation'),
   ('./utils/apache_terms.txt', './utils'),
-  ('./utils/chunks.txt', './utils'),
   ('./utils/credits.txt', './utils'),
   ('./utils/view_mode.txt', './utils'),
   ('./utils/key.txt', './utils'),
@@ -14,7 +13,7 @@ add_files = [
   ('.venv\Lib\site-packages\whisper', './whisper'),
   ('.venv\Lib\site-packages\pyannote', './pyannote'),
   ('.venv\Lib\site-packages/faster_whisper', './faster_whisper'),
-  ('.venv\Lib\site-packages/faster_whisper-0.10.0.dist-info', './faster_whisper-0.10.0.dist-info'),
+  ('.venv\Lib\site-packages/faster_whisper-1.1.0.dist-info', './faster_whisper-1.1.0.dist-info'),
   ('.venv\Lib\site-packages\pydub', './pydub'),
   ('.venv\Lib\site-packages\pydub-0.25.1.dist-info', './pydub-0.25.1.dist-info'),
   ('.venv\Lib\site-packages\lightning_fabric', './lightning_fabric'),
@@ -16,8 +16,10 @@ SPDX-License-Identifier: Apache-2.0
 # TOP-LEVEL IMPORTS
 # ...
 import os
+import re
 import sys
 import time
+import queue
 import shutil
 import threading
 import webbrowser
@@ -43,6 +45,8 @@ from contextlib import redirect_stdout, redirect_stderr
 
 from scripts.assist import resource_path, find_key_paths, magic, delete_LOKAL_temp
 from scripts.utils import FAMILIES, MODEL_SIZES, TYPES, LANGUAGES, check_license
+from scripts import workspace
+from scripts import progress
 
 
 # ---------------------
@@ -371,6 +375,19 @@ def app():
     console_frame.config(bg="black", foreground="white")
     console_frame.pack(fill=X, expand=TRUE)
 
+    # JOB QUEUE AREA (shows once files are queued)
+    global queue_frame, queue_view, queue_eta
+    queue_frame = tb.Frame(lower_frame)
+    queue_view = tb.Treeview(
+        queue_frame, columns=("file", "settings", "status"), show="headings", height=5
+    )
+    queue_view.heading("file", text="FILE")
+    queue_view.heading("settings", text="SETTINGS")
+    queue_view.heading("status", text="STATUS")
+    queue_view.pack(fill=X, expand=TRUE)
+    queue_eta = tb.Label(queue_frame, text="", font="Helvetica 8")
+    queue_eta.pack(anchor="e")
+
     # FINAL RUN AREA
     global btn_run
     btn_run = tb.Button(
@@ -378,6 +395,14 @@ def app():
     )
     btn_run.pack(fill=X, anchor="w")
 
+    btn_queue = tb.Button(
+        run_frame,
+        text="Add files to queue (current settings)",
+        command=add_to_queue,
+        bootstyle="dark, outline",
+    )
+    btn_queue.pack(fill=X, pady=[3, 0], anchor="w")
+
     if license_status != magic():
         global btn_pay
         btn_pay = tb.Button(run_frame, text=call_to_action, bootstyle="dark, outline")
@@ -396,6 +421,12 @@ def app():
     lbl_reset.pack(side=RIGHT, pady=3)
     lbl_reset.bind("<Button-1>", reset_models)
 
+    lbl_clear = tb.Label(
+        run_frame, text="CLEAR QUEUE", font="Helvetica 8", cursor="hand2"
+    )
+    lbl_clear.pack(side=RIGHT, pady=3, padx=7)
+    lbl_clear.bind("<Button-1>", clear_queue)
+
     # Loop call so app refreshes on the regular
     logger(
         "\n> LOKAL is made for comfort, not speed.\
@@ -403,6 +434,7 @@ def app():
         "[LKL|MSG]",
     )
     app.after_idle(toggle_mode)
+    app.after(CONSOLE_POLL_MS, drain_console)
     app.protocol("WM_DELETE_WINDOW", kill_everything)
     app.bind("<Escape>", lambda e: kill_everything())
     app.mainloop()
@@ -421,8 +453,11 @@ def run():
     except Exception:
         logger("...", "[LKL|MSG]")
 
+    # Queued files take precedence over the single selected audio
+    queued = [job for job in QUEUE if job["status"] == "queued"]
+
     # Check audio is selected and T&Cs are agreed, proceed if so
-    if settings["path_to_audio"] == "":
+    if settings["path_to_audio"] == "" and len(queued) == 0:
         logger(
             "\n\n\n> You have not selected an audio file. You need to select an audio for a transcription to be possible.",
             "[LKL|MSG]",
@@ -447,7 +482,7 @@ def run():
         app.update()
         try:
             transcription_thread = threading.Thread(
-                target=run_transcription, daemon=True
+                target=run_queue if len(queued) > 0 else run_transcription, daemon=True
             )
             transcription_thread.start()
             btn_run.configure(
@@ -460,12 +495,14 @@ def run():
             logger(f"> Transcription thread has failed: {e}", "[LKL|MSG]")
 
 
-def run_transcription():
-    """F(x) organises the transcription flow."""
+def run_transcription(job=None):
+    """F(x) organises the transcription flow.
+    Transcribes the audio selected in the window or, if given, a queued job
+    (which carries its own settings and reports back through job["done"]).
+    """
 
     # FUNCTION IMPORTS
     from scripts.lokal_transcribe import transcription_flow
-    from scripts.utils import convert_to_wav, delete_converted_wav
 
     # TIMER
     start_time = time.time()
@@ -474,92 +511,273 @@ def run_transcription():
     logger(f">>> STARTING PROCESS.\n", "[LKL|MSG]")
 
     # KEY SETTINGS
-    path_to_audio = settings["path_to_audio"]
-    filename = path_to_audio.rsplit("/")[-1].rsplit(".")[0]
+    queued = job is not None
+    if not queued:
+        job = make_job(settings["path_to_audio"])
+    job_settings, filename, HPs, opts = (
+        job["settings"],
+        job["filename"],
+        job["HPs"],
+        job["opts"],
+    )
+    # T&Cs as they stand now (files may be queued before they are accepted)
+    job_settings = {**job_settings, "tcs_ok": settings["tcs_ok"]}
     done = 0  # -> to 1 if transcription succeeds
 
-    # OPTIONAL AUDIO CONVERSION
-    conversion = 0
-    if path_to_audio.endswith(".wav") is not True:
+    # OPTIONAL STREAMING DECODE (non-WAV audios go straight from FFmpeg to the models)
+    if opts.get("stream"):
         logger(
-            "> CONVERTING AUDIO TO .WAV FORMAT. To avoid this step in the future, use .WAV audios.",
+            "> DECODING AUDIO ON THE FLY. No .wav copy is needed.\n",
             "[LKL|MSG]",
         )
-        conversion = convert_to_wav(path_to_audio, filename)
-        if conversion == 1:
-            path_to_audio = (
-                path_to_audio.rpartition("/")[0]
-                + "/"
-                + filename
-                + "-wavcopyforLOKALtranscription"
-                + ".wav"
-            )
-            logger("> Audio conversion succesful.\n", "[LKL|MSG]")
-        else:
-            logger("> Audio conversion failed. Try using .WAV audios.\n", "[LKL|MSG]")
 
-    # OPTIONAL HPs for SEGMENTATION || DIARISATION
+    # CALL TRANSCRIPTION
+    # Register context f(x)'s to redirect stdout and stderr to main app window
+    f = WriteProcessor()
+    g = WriteProcessor()
+
+    # Launch transcription
+    with redirect_stderr(f):
+        with redirect_stdout(g):
+            try:
+                # Reject transcription if T&Cs not agreed
+                if job_settings["tcs_ok"] is not True:
+                    print("> Terms & conditions not agreed.")
+
+                # Proceed if user agreed to T&Cs
+                else:
+                    try:
+                        result, done = transcription_flow(
+                            job_settings, filename, HPs, opts=opts
+                        )
+                    except Exception as e:  # Delete any temp folders if failure
+                        logger(f"> Transcription failed: {e}\n", "[LKL|MSG]")
+                        logger(f"> Deleting temporary folders.\n", "[LKL|MSG]")
+                        try:
+                            delete_LOKAL_temp()
+                        except Exception:
+                            logger(
+                                "> Unable to find or delete temporary folders. For good health, check your 'user' folder for a folder named 'LOKAL_temp'. If present, delete 'LOKAL_temp' to avoid future errors.",
+                                "[LKL|MSG]",
+                            )
+
+                # Check timer and pop message if transcription succeeds
+                job["done"] = done
+                if done == 1:
+                    if not queued:
+                        call_in_gui(btn_run.configure, text="Run transcription", command=run)
+                    end_time = time.time()
+                    execution_time = end_time - start_time
+                    mm, ss = divmod(execution_time, 60)
+                    hh, mm = divmod(mm, 60)
+                    duration = f"{int(hh):02}:{int(mm):02}:{int(ss):02}"
+                    victory_msg = f"> {result}\n- Execution time: {duration}.\n\n> THANK YOU FOR USING LOKAL!"
+                    logger(victory_msg, "[LKL|MSG]")
+                    return victory_msg
+            except Exception:
+                fail_msg = "Transcription failed. Try a different model/approach."
+                logger(fail_msg, "[LKL|MSG]")
+                return fail_msg
+
+
+def make_job(path_to_audio):
+    """F(x) snapshots current settings and hyper-parameters for one audio."""
+    return {
+        "settings": {**settings, "path_to_audio": path_to_audio},
+        "filename": path_to_audio.rsplit("/")[-1].rsplit(".")[0],
+        "HPs": read_HPs(settings["approach"]),
+        "opts": decode_opts(path_to_audio),
+        "done": 0,
+    }
+
+
+def read_HPs(approach):
+    """F(x) reads OPTIONAL HPs for SEGMENTATION || DIARISATION from the window."""
     HPs = {}
-    if settings["approach"] == "segmentation":
+    if approach == "segmentation":
         HPs = {
             "min_duration_on": hps_param1.amountusedvar.get() / 1000,
             "min_duration_off": hps_param2.amountusedvar.get() / 1000,
         }
-    if settings["approach"] == "diarisation":
+    if approach == "diarisation":
         HPs = {
             "min_duration_off": hps_param2.amountusedvar.get() / 1000,
             "speaker_num": hps_param4.get(),
         }
+    return HPs
 
-    # CALL TRANSCRIPTION
-    if path_to_audio.endswith(".wav"):
-        # Register context f(x)'s to redirect stdout and stderr to main app window
-        f = WriteProcessor()
-        g = WriteProcessor()
-
-        # Launch transcription
-        with redirect_stderr(f):
-            with redirect_stdout(g):
-                try:
-                    # Reject transcription if T&Cs not agreed
-                    if settings["tcs_ok"] is not True:
-                        print("> Terms & conditions not agreed.")
-
-                    # Proceed if user agreed to T&Cs
-                    else:
-                        try:
-                            result, done = transcription_flow(settings, filename, HPs)
-                        except Exception as e:  # Delete any temp folders if failure
-                            logger(f"> Transcription failed: {e}\n", "[LKL|MSG]")
-                            logger(f"> Deleting temporary folders.\n", "[LKL|MSG]")
-                            try:
-                                delete_LOKAL_temp()
-                            except Exception:
-                                logger(
-                                    "> Unable to find or delete temporary folders. For good health, check your 'user' folder for a folder named 'LOKAL_temp'. If present, delete 'LOKAL_temp' to avoid future errors.",
-                                    "[LKL|MSG]",
-                                )
-
-                    # House cleaning
-                    if conversion == 1:
-                        deletion_msg = delete_converted_wav(path_to_audio)
-                        logger(deletion_msg, "[LKL|MSG]")
-
-                    # Check timer and pop message if transcription succeeds
-                    if done == 1:
-                        btn_run.configure(text="Run transcription", command=run)
-                        end_time = time.time()
-                        execution_time = end_time - start_time
-                        mm, ss = divmod(execution_time, 60)
-                        hh, mm = divmod(mm, 60)
-                        duration = f"{int(hh):02}:{int(mm):02}:{int(ss):02}"
-                        victory_msg = f"> {result}\n- Execution time: {duration}.\n\n> THANK YOU FOR USING LOKAL!"
-                        logger(victory_msg, "[LKL|MSG]")
-                        return victory_msg
-                except Exception:
-                    fail_msg = "Transcription failed. Try a different model/approach."
-                    logger(fail_msg, "[LKL|MSG]")
-                    return fail_msg
+
+def decode_opts(path_to_audio):
+    """F(x) picks decoding options: non-WAV audios are decoded on the fly."""
+    if path_to_audio.endswith(".wav") is not True:
+        return {"in_memory": True, "memmap": True, "stream": True}
+    return {}
+
+
+# ---------------------
+# JOB QUEUE
+# ...
+# Queued jobs, in order: make_job() dicts plus row id, audio seconds & status
+QUEUE = []
+
+# Seconds spent per second of audio on finished jobs (drives the ETA)
+QUEUE_PACE = {"audio_s": 0.0, "wall_s": 0.0}
+
+# Pending refresh of the queue view, if any
+QUEUE_TIMER = {"id": None}
+
+
+def add_to_queue():
+    """F(x) queues one or more audios with the settings currently selected."""
+    from scripts.utils import calc_audio_length
+
+    paths = filedialog.askopenfilenames(
+        filetypes=(
+            (
+                "common audio formats",
+                ("*.wav", "*.mp3", "*.mp4", "*.m4a", "*.flac", "*.wma", "*.aac"),
+            ),
+            ("all files", "*.*"),
+        ),
+        initialdir=find_key_paths()[1],
+    )
+    for path_to_audio in paths:
+        job = make_job(path_to_audio)
+        try:
+            job["seconds"] = calc_audio_length(path_to_audio)
+        except Exception:
+            job["seconds"] = 0
+        job["status"] = "queued"
+        job["iid"] = queue_view.insert(
+            "",
+            END,
+            values=(
+                os.path.basename(path_to_audio),
+                f"{settings['family']} {settings['model']} | {settings['approach']} | {settings['language']}",
+                "Queued",
+            ),
+        )
+        QUEUE.append(job)
+
+    if len(paths) > 0:
+        queue_frame.pack(fill=X, pady=(0, 7), before=btn_run.master)
+        refresh_queue()
+
+
+def clear_queue(e):
+    """F(x) drops every queued job that is not running."""
+    for job in list(QUEUE):
+        if job["status"] != "running":
+            queue_view.delete(job["iid"])
+            QUEUE.remove(job)
+    if len(QUEUE) == 0:
+        queue_frame.forget()
+    refresh_queue()
+
+
+def run_queue():
+    """F(x) transcribes queued jobs back to back in the background thread.
+    Models stay warm in the registry, so they load once for the whole queue.
+    """
+    while True:
+        # Next queued job (the queue may change while jobs run)
+        job = next((job for job in QUEUE if job["status"] == "queued"), None)
+        if job is None:
+            break
+        job["status"], job["started"] = "running", time.time()
+        call_in_gui(refresh_queue)
+        run_transcription(job)
+        job["elapsed"] = time.time() - job["started"]
+        job["status"] = "done" if job["done"] == 1 else "failed"
+        if job["done"] == 1 and job["seconds"] > 0:
+            QUEUE_PACE["audio_s"] += job["seconds"]
+            QUEUE_PACE["wall_s"] += job["elapsed"]
+    call_in_gui(btn_run.configure, text="Run transcription", command=run)
+
+
+def refresh_queue():
+    """F(x) updates per-job status and total ETA; repeats while jobs run."""
+    pace = (
+        QUEUE_PACE["wall_s"] / QUEUE_PACE["audio_s"] if QUEUE_PACE["audio_s"] > 0 else None
+    )
+    remaining = 0.0
+    for job in QUEUE:
+        if job["status"] == "running":
+            elapsed = time.time() - job["started"]
+            seen = PROGRESS_SEEN.get(job["settings"]["path_to_audio"], {})
+            if seen.get("fraction", 0) > 0 and seen.get("eta_s") is not None:
+                status = f"Running {min(99, int(100 * seen['fraction']))}%"
+                remaining += seen["eta_s"]
+            elif pace is not None and job["seconds"] > 0:
+                expected = job["seconds"] * pace
+                status = f"Running {min(99, int(100 * elapsed / expected))}%"
+                remaining += max(0.0, expected - elapsed)
+            else:
+                status = f"Running {hhmmss(elapsed)}"
+        elif job["status"] == "queued":
+            status = "Queued"
+            remaining += job["seconds"] * pace if pace is not None else 0.0
+        elif job["status"] == "done":
+            status = f"Done in {hhmmss(job['elapsed'])}"
+        else:
+            status = "Failed"
+        queue_view.set(job["iid"], "status", status)
+
+    # TOTAL ETA (known once one job has finished)
+    active = any(job["status"] in ["running", "queued"] for job in QUEUE)
+    if not active:
+        queue_eta.configure(text="")
+    elif pace is None:
+        queue_eta.configure(text="Total ETA: after the first file")
+    else:
+        queue_eta.configure(text=f"Total ETA: {hhmmss(remaining)}")
+    # One refresh chain at a time (refreshes are also triggered by hand)
+    if QUEUE_TIMER["id"] is not None:
+        app.after_cancel(QUEUE_TIMER["id"])
+        QUEUE_TIMER["id"] = None
+    if any(job["status"] == "running" for job in QUEUE):
+        QUEUE_TIMER["id"] = app.after(1000, refresh_queue)
+
+
+# ---------------------
+# PROGRESS
+# ...
+# Every job's progress events (scripts.progress), drained from the Tk loop
+PROGRESS_EVENTS = progress.subscribe()
+
+# Latest event per job (by path to its audio)
+PROGRESS_SEEN = {}
+
+
+def show_progress():
+    """F(x) shows the latest progress of the running job in the console.
+    Only the newest event counts, so a burst of updates is a single redraw.
+    Called by drain_console; returns whether anything was drawn.
+    """
+    latest = None
+    while True:
+        try:
+            latest = PROGRESS_EVENTS.get_nowait()
+        except queue.Empty:
+            break
+        PROGRESS_SEEN[latest["path"]] = latest
+
+    if latest is not None and latest["kind"] == "progress":
+        eta = f", about {hhmmss(latest['eta_s'])} left" if latest["eta_s"] else ""
+        if console_frame.get("end-2l", "end-1l").startswith("- Progress:"):
+            console_frame.delete("end-2l", "end-1l")
+        console_frame.insert(
+            END,
+            f"- Progress: {int(100 * latest['fraction'])}% ({hhmmss(latest['done_s'])} of {hhmmss(latest['total_s'])} of audio{eta})\n",
+        )
+        return True
+    return False
+
+
+def hhmmss(seconds):
+    mm, ss = divmod(int(seconds), 60)
+    hh, mm = divmod(mm, 60)
+    return f"{hh:02}:{mm:02}:{ss:02}"
 
 
 # Nice class to enable real-time logging for transcription.
@@ -745,7 +963,110 @@ def hparams(approach):
         segmentation_params.forget()
 
 
+# ---------------------
+# CONSOLE
+# ...
+# Updates waiting for the console, as (text, source), put there from any thread
+CONSOLE = queue.Queue()
+
+# Oldest lines go once the console holds more than this
+CONSOLE_MAX_LINES = 2000
+
+CONSOLE_POLL_MS = 100
+
+# How far back a redrawn bar looks for the line it goes after
+CONSOLE_LOOKBACK = 50
+
+# Annoying warnings that most users do not need
+CONSOLE_WARNINGS = [
+    "set_audio_backend",
+    "torchaudio backend is switched to",
+    "torchvision is not available",
+    "To support symlinks on Windows,",
+    "HF_HUB_DISABLE_SYMLINKS_WARNING",
+    "Disabling tokenizer parallelism,",
+    "FutureWarning: The input name `inputs` is deprecated",
+]
+
+# Progress bars: tqdm ("45%|") and rich ("45% 0:00:12"), as Faster Whisper
+# downloads and Pyannote draw them
+BAR = re.compile(r"\d{1,3}%(\||\s+(\d+:\d{2}:\d{2}|-:--:--))")
+DOWNLOAD_TERMS = ["vocabulary.txt", "tokenizer.json", "config.json", "model.bin"]
+PYANNOTE_TERMS = ["segmentation", "embeddings", "diarization"]
+
+
 def logger(text, source):
+    """F(x) queues an update for the main app console.
+    Safe from any thread: only the Tk loop writes to the console (drain_console).
+    """
+    CONSOLE.put((text, source))
+
+
+def drain_console():
+    """F(x) writes queued updates and the latest progress to the console; repeats.
+    A run of updates to the same progress bar is drawn once, at its newest value.
+    """
+    updates = []
+    while True:
+        try:
+            updates.append(CONSOLE.get_nowait())
+        except queue.Empty:
+            break
+
+    for i, (text, source) in enumerate(updates):
+        if source == "[LKL|CALL]":
+            text()
+            continue
+        bar = bar_kind(text, source)
+        if bar is not None and i + 1 < len(updates) and bar_kind(*updates[i + 1]) == bar:
+            continue
+        render_console(text, source)
+    drawn = show_progress()
+
+    # Keep the console to its last CONSOLE_MAX_LINES lines
+    if len(updates) > 0 or drawn:
+        lines = int(console_frame.index("end-1c").split(".")[0])
+        if lines > CONSOLE_MAX_LINES:
+            console_frame.delete("1.0", f"{lines - CONSOLE_MAX_LINES + 1}.0")
+        console_frame.see("end")
+    app.after(CONSOLE_POLL_MS, drain_console)
+
+
+def bar_kind(text, source):
+    """F(x) tells which progress bar an update redraws (None if not a bar).
+    LOKAL's own lines (e.g. transcribed text saying "50%") are never bars.
+    """
+    if source != "[LOKAL|REDIRECT]" or text.startswith("[LKL|"):
+        return None
+    if BAR.search(text) is None or any(warning in text for warning in CONSOLE_WARNINGS):
+        return None
+    for term in DOWNLOAD_TERMS + PYANNOTE_TERMS:
+        if term in text:
+            return term
+    return "tqdm"
+
+
+def clear_after(markers):
+    """F(x) deletes console lines after the last one holding any of the markers,
+    looking back CONSOLE_LOOKBACK lines at most. Returns whether one was found
+    (if not, nothing is deleted).
+    """
+    last = int(console_frame.index("end-1c").split(".")[0])
+    for n in range(last, max(0, last - CONSOLE_LOOKBACK), -1):
+        if any(marker in console_frame.get(f"{n}.0", f"{n}.end") for marker in markers):
+            console_frame.delete(f"{n}.end", END)
+            return True
+    return False
+
+
+def call_in_gui(f, *args, **kwargs):
+    """F(x) runs f(*args, **kwargs) on the Tk loop, in order with console updates.
+    Worker threads use it for anything that touches widgets.
+    """
+    CONSOLE.put((lambda: f(*args, **kwargs), "[LKL|CALL]"))
+
+
+def render_console(text, source):
     """F(x) inserts any app generated updates to main app console.
     Ugliest function ever, but there is a need to be very careful
     not to accidentally trigger an infinite loop if a transcribed
@@ -756,40 +1077,19 @@ def logger(text, source):
     # One needs to put things into it as required
 
     if source == "[LOKAL|REDIRECT]":
-        warnings = [
-            "set_audio_backend",
-            "torchaudio backend is switched to",
-            "torchvision is not available",
-            "To support symlinks on Windows,",
-            "HF_HUB_DISABLE_SYMLINKS_WARNING",
-            "Disabling tokenizer parallelism,",
-            "FutureWarning: The input name `inputs` is deprecated",
-        ]
 
         if any(
-            warning in text for warning in warnings
+            warning in text for warning in CONSOLE_WARNINGS
         ):  # Ignore annoying warnings that most users do not need
             pass
 
-        elif "%" in text:  # Take a special approach to render progress bars
-
-            fs_download_terms = [
-                "vocabulary.txt",
-                "tokenizer.json",
-                "config.json",
-                "model.bin",
-            ]
-            pyannote_terms = ["segmentation", "embeddings", "diarization"]
+        elif bar_kind(text, source) is not None:  # Take a special approach to render progress bars
 
-            bool = True
-            while bool is True:
-                console_frame.delete("end-1l", END)
-                if "> " in console_frame.get("end-1c linestart", "end-1c lineend"):
-                    console_frame.insert(END, "\n\n")
-                    bool = False
+            if clear_after(["> "]):
+                console_frame.insert(END, "\n\n")
 
             if any(
-                term in text for term in fs_download_terms
+                term in text for term in DOWNLOAD_TERMS
             ):  # Faster whisper downloads (tqdm, tricky)
 
                 if "model.bin" in text:  # Rewrite progress bar only for main model file
@@ -801,20 +1101,10 @@ def logger(text, source):
                     console_frame.insert(END, text)
 
             elif any(
-                term in text for term in pyannote_terms
+                term in text for term in PYANNOTE_TERMS
             ):  # Pyannote bars (rich bars)
                 # Flag last log before download start & delete lines after
-                bool = True
-                while bool is True:
-                    console_frame.delete("end-1l", END)
-                    if "Segmenting audio" in console_frame.get(
-                        "end-1c linestart", "end-1c lineend"
-                    ):
-                        bool = False
-                    if "Diarising audio" in console_frame.get(
-                        "end-1c linestart", "end-1c lineend"
-                    ):
-                        bool = False
+                clear_after(["Segmenting audio", "Diarising audio"])
                 console_frame.insert(
                     "end", "\n{}".format(text.replace("segmentation", ""))
                 )
@@ -823,31 +1113,6 @@ def logger(text, source):
                 console_frame.delete("end-2l", "end-1l")
                 console_frame.insert(INSERT, text)
 
-        elif text.startswith("[INFO|"):
-            if "Setting `return_timestamps=True` for long-form generation" in text:
-                console_frame.insert(
-                    INSERT,
-                    "- Marks. Set...\n",
-                )
-            elif (
-                "generation_whisper.py" in text
-                and "conditioned on previous segment" in text
-            ):
-                with open(resource_path("utils/chunks.txt"), "r") as f:
-                    current_chunk, total_chunks = [int(n) for n in f.read().split(",")]
-                    f.close()
-                with open(resource_path("utils/chunks.txt"), "w") as f:
-                    f.write(f"{current_chunk +1},{total_chunks}")
-                    f.close()
-                if current_chunk != 0:
-                    console_frame.delete("end-2l", "end-1l")
-                  
-                progress = int(100*( current_chunk / total_chunks))
-                console_frame.insert(
-                    INSERT,
-                    f"- Rough progress estimate: {progress}% {'' if progress <= 100 else '(for long audios, estimate can go significantly over 100%.'}\n",
-                )    
-        
         elif text.startswith("[LKL|MSG]"):
             console_frame.insert(INSERT, text.replace("[LKL|MSG]", "\n>"))
         
@@ -855,7 +1120,6 @@ def logger(text, source):
             console_frame.insert(INSERT, text.replace("[LKL|VERBOSE]", "-"))
     else:
         console_frame.insert(INSERT, text)
-    console_frame.see("end")
 
 
 def pop_window(e, pop_type):
@@ -933,6 +1197,9 @@ def reset_models(e):
     msg = "Click OK to confirm deletion of transcription models."
     confirm = messagebox.askokcancel(title="Reset models", message=msg)
     if confirm is True:
+        from scripts.registry import clear
+
+        clear()
         for i in ["openai", "systran"]:
             for j in os.listdir(f"./models/{i}"):
                 if not j.startswith("README"):
@@ -971,16 +1238,12 @@ def kill_everything():
     # Try to delete any TEMP folders created and not deleted otherwise
     print("Attempting a graceful exit.")
     try:
-        path_to_temp_folder = find_key_paths()[0] + "/LOKAL_temp"
         try:
             print("Removing TEMP folders, if any.")
-            shutil.rmtree(path_to_temp_folder)
+            workspace.release_all()
+            workspace.cleanup_stale()
         except Exception:
-            try:
-                print("Removing TEMP folders, if any.")
-                os.rmdir(path_to_temp_folder)
-            except Exception:
-                print("Exiting.")
+            print("Exiting.")
     except Exception:
         print(
             "Unable to exit gracefully. Check your 'user' folder for a folder named 'LOKAL_temp'. If present, delete 'LOKAL_temp' to avoid future errors.")
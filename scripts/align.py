@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Packing of speech regions into 30s windows and alignment of transcribed
+segments back onto regions, turns or chunks, using sorted arrays, and
+stitching of shards transcribed separately.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+
+# ---------------------
+# PACKING
+# ...
+def pack_regions(starts, duration, window=30.0):
+    """F(x) groups adjacent regions into windows of at most `window` seconds.
+    Region i spans starts[i] to starts[i + 1] (the last one, to duration),
+    same as split_audio. Returns [first, last] region indices per window.
+    Regions longer than a window get a window of their own.
+    """
+    ends = list(starts[1:]) + [duration]
+    groups = []
+    first = 0
+    for i in range(1, len(starts) + 1):
+        if i == len(starts) or ends[i] - starts[first] > window:
+            groups.append([first, i - 1])
+            first = i
+    return groups
+
+
+# ---------------------
+# ALIGNMENT
+# ...
+def assign(boundaries, times):
+    """F(x) returns, for each time, the index of the interval it falls in.
+    Intervals start at the sorted boundaries; times before the first
+    boundary go to the first interval.
+    """
+    import numpy as np
+
+    idx = np.searchsorted(np.asarray(boundaries), np.asarray(times), side="right") - 1
+    return np.clip(idx, 0, max(len(boundaries) - 1, 0))
+
+
+def join_by_index(n, idx, texts):
+    """F(x) concatenates texts into n buckets following idx (keeps order)"""
+    buckets = [""] * n
+    for i, text in zip(idx, texts):
+        buckets[int(i)] += text
+    return buckets
+
+
+# ---------------------
+# STITCHING
+# ...
+def drop_repeated_words(previous, text, max_words=8):
+    """F(x) removes from the start of text the longest run of words (up to
+    max_words) that also ends previous, as happens where two shards overlap.
+    Words are compared lower-cased and without punctuation.
+    """
+    import string
+
+    def norm(word):
+        return word.strip(string.punctuation).lower()
+
+    tail = [norm(w) for w in previous.split()][-max_words:]
+    words = text.split()
+    head = [norm(w) for w in words[:max_words]]
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if tail[-k:] == head[:k]:
+            return " " + " ".join(words[k:]) if k < len(words) else ""
+    return text
@@ -33,14 +33,11 @@ def find_key_paths():
 
 
 def delete_LOKAL_temp():
-    ''' F(x) deletes LOKAL_temp, used to store intermediate steps.
-        Folder needs to be deleted to avoid errors in future.
+    ''' F(x) deletes leftovers in LOKAL_temp, used to store intermediate steps.
+        Workspaces of jobs still running are left alone.
     '''
-    path_to_temp_folder = find_key_paths()[0] + "/LOKAL_temp"
-    try:
-        shutil.rmtree(path_to_temp_folder)
-    except Exception:
-        os.rmdir(path_to_temp_folder)
+    from scripts.workspace import cleanup_stale
+    cleanup_stale()
 
 
 # ---------------------
@@ -58,22 +55,7 @@ def split_audio(filepath, filename, path_to_temp_folder, approach):
     from pydub import AudioSegment
 
     # Build array to organise splitting
-    CHUNKS = []
-    currentSpeaker = ""
-    if approach == "segmentation":
-        with open(path_to_temp_folder + "/" + "temp-segments.txt", "r") as f:
-            for line in f.readlines():
-                newline = line.split(", ")
-                CHUNKS.append([float(newline[0]), float(newline[1])])
-            f.close()
-    else:
-        with open(path_to_temp_folder + "/" + "temp-diary.txt", "r") as f:
-            for line in f.readlines():
-                newline = line.split(", ")
-                if newline[2] != currentSpeaker:
-                    CHUNKS.append([newline[2], float(newline[0])])
-                    currentSpeaker = newline[2]
-            f.close()
+    CHUNKS = read_chunks(path_to_temp_folder, approach)
 
     # Split audio into a file per speaker segment
     i = 0
@@ -100,6 +82,39 @@ def split_audio(filepath, filename, path_to_temp_folder, approach):
     return CHUNKS
 
 
+# PATHS OF THE TEMP AUDIOS WRITTEN BY split_audio, IN CHUNK ORDER
+def chunk_files(path_to_temp_folder, filename, n_chunks):
+    ''' F(x) lists the temp WAVs split_audio writes for n_chunks chunks.
+    '''
+    n = len(str(n_chunks))
+    return [path_to_temp_folder + "/" + filename + str(i).zfill(n) + ".wav"
+            for i in range(n_chunks)]
+
+
+# READ SEGMENTATION || DIARISATION RESULTS
+def read_chunks(path_to_temp_folder, approach):
+    ''' F(x) reads the temp TXT written by segmentation or diarisation.
+        Returns [start, end] (segmentation) or [speaker, start] (diarisation) pairs.
+    '''
+    CHUNKS = []
+    currentSpeaker = ""
+    if approach == "segmentation":
+        with open(path_to_temp_folder + "/" + "temp-segments.txt", "r") as f:
+            for line in f.readlines():
+                newline = line.split(", ")
+                CHUNKS.append([float(newline[0]), float(newline[1])])
+            f.close()
+    else:
+        with open(path_to_temp_folder + "/" + "temp-diary.txt", "r") as f:
+            for line in f.readlines():
+                newline = line.split(", ")
+                if newline[2] != currentSpeaker:
+                    CHUNKS.append([newline[2], float(newline[0])])
+                    currentSpeaker = newline[2]
+            f.close()
+    return CHUNKS
+
+
 # RANDOM CHECKS
 def checker():
     from scripts.assist import resource_path
@@ -175,18 +190,26 @@ def whisper_loop(path_to_temp_folder, filename, path_to_prompt, model_size, lang
 
 
 # FUNCTION TO JOIN TEMPORARY TRANSCRIPTS
-def together(path_to_temp_folder, CHUNKS):
-    ''' F(x) joins temp files into a single array
+def together(path_to_temp_folder, CHUNKS, texts=None, filename=""):
+    ''' F(x) joins temp files into a single array.
+        If transcriptions were kept in memory, they are joined directly.
+        Otherwise, each chunk's TXT sits next to its temp WAV (see chunk_files).
     '''
     # Define stuff needed in function
     LINES = []
-    # Join the diarisation array and contents of temporary TXT files
-    i = 0
-    for file in os.listdir(path_to_temp_folder):
-        if file.endswith(".txt") and not file.startswith("temp-"):
-            with open(path_to_temp_folder + "/" + file) as f:
-                LINES.append([CHUNKS[i][0], CHUNKS[i][1], f.read()])
-                i += 1
+    # In-memory records need no file reads
+    if texts is not None:
+        for chunk, text in zip(CHUNKS, texts):
+            LINES.append([chunk[0], chunk[1], text])
+        return LINES
+    # Join the diarisation array and contents of temporary TXT files, in chunk order
+    files = chunk_files(path_to_temp_folder, filename, len(CHUNKS))
+    for chunk, file in zip(CHUNKS, files):
+        try:
+            with open(file[:-4] + ".txt") as f:
+                LINES.append([chunk[0], chunk[1], f.read()])
+        except Exception:
+            LINES.append([chunk[0], chunk[1], ""])
     # Return the joint array
     return LINES
 
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+In-memory audio helpers: decode once to 16 kHz mono float32 and slice.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+
+# Sampling rate expected by all Whisper-like models
+SAMPLE_RATE = 16000
+
+
+# ---------------------
+# DECODING
+# ...
+def decode(path_to_audio, path_to_raw="", sr=SAMPLE_RATE):
+    """F(x) decodes an audio once per job into a shared decoded-audio dict:
+    {"samples": mono float32 array, "sample_rate": sr, "duration": seconds}.
+    If path_to_raw is given, samples are memory-mapped from that file
+    instead of being held in RAM.
+    """
+    if path_to_raw != "":
+        samples = load_audio_to_file(path_to_audio, path_to_raw, sr)
+    else:
+        samples = load_audio(path_to_audio, sr)
+    return {"samples": samples, "sample_rate": sr, "duration": len(samples) / sr}
+
+
+def load_audio(path_to_audio, sr=SAMPLE_RATE):
+    """F(x) decodes any audio into a mono float32 NumPy array at sr.
+    Uses FFmpeg if available and falls back to PyAV (ships with Faster Whisper).
+    """
+
+    # FUNCTION IMPORTS
+    import subprocess
+    import numpy as np
+
+    # FFMPEG
+    cmd = ffmpeg_cmd(path_to_audio, sr, "s16le") + ["-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+    # PYAV FALLBACK
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        from faster_whisper.audio import decode_audio
+
+        return decode_audio(path_to_audio, sampling_rate=sr)
+
+
+def load_audio_to_file(path_to_audio, path_to_raw, sr=SAMPLE_RATE):
+    """F(x) has FFmpeg write raw float32 PCM to disk and memory-maps it.
+    Copy-on-write mapping: views are writable (torch needs that) but
+    nothing is ever written back to the file.
+    """
+
+    # FUNCTION IMPORTS
+    import subprocess
+    import numpy as np
+
+    # FFMPEG STRAIGHT TO FILE (no Python-side buffer)
+    cmd = ffmpeg_cmd(path_to_audio, sr, "f32le") + ["-y", path_to_raw]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return load_audio(path_to_audio, sr)
+
+    # EMPTY AUDIOS CANNOT BE MAPPED
+    if os.path.getsize(path_to_raw) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path_to_raw, dtype=np.float32, mode="c")
+
+
+def stream_audio(path_to_audio, block_seconds=600, sr=SAMPLE_RATE):
+    """F(x) streams FFmpeg output as (offset_seconds, samples) blocks.
+    Blocks end at the quietest point of their last seconds, so words are
+    rarely cut, and memory stays bounded to about one block.
+    No intermediate file is written.
+    """
+
+    # FUNCTION IMPORTS
+    import subprocess
+    import tempfile
+    import numpy as np
+
+    # START DECODER (falls back to a full PyAV decode if FFmpeg is missing)
+    # FFmpeg's log goes to a temp file (a pipe nobody reads could fill up and stall it)
+    cmd = ffmpeg_cmd(path_to_audio, sr, "f32le") + ["-"]
+    log = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log)
+    except FileNotFoundError:
+        log.close()
+        samples = load_audio(path_to_audio, sr)
+        step = int(block_seconds * sr)
+        for start in range(0, len(samples), step):
+            yield start / sr, samples[start : start + step]
+        return
+
+    # READ BLOCKS
+    block_bytes = int(block_seconds * sr) * 4
+    carry = np.zeros(0, dtype=np.float32)
+    offset = 0
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            block = np.concatenate([carry, np.frombuffer(data, dtype=np.float32)])
+
+            # Cut at a quiet point unless this is the last block
+            if len(data) < block_bytes:
+                cut = len(block)
+            else:
+                cut = quietest_point(block, len(block) - 5 * sr, len(block), sr)
+            yield offset / sr, block[:cut]
+            offset += cut
+            carry = block[cut:]
+
+        # A corrupt or unsupported file must fail, not pass for a short (or empty) audio
+        if process.wait() != 0:
+            log.seek(0)
+            lines = log.read().decode("utf-8", errors="replace").strip().splitlines()
+            reason = lines[-1] if len(lines) > 0 else f"exit status {process.returncode}"
+            raise RuntimeError(f"FFmpeg could not decode {os.path.basename(path_to_audio)}: {reason}")
+        if len(carry) > 0:
+            yield offset / sr, carry
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        log.close()
+
+
+def quietest_point(samples, start, end, sr=SAMPLE_RATE, frame_seconds=0.1):
+    """F(x) returns the sample index at the centre of the lowest-energy
+    frame between start and end (indices into samples)
+    """
+    import numpy as np
+
+    frame = max(1, int(frame_seconds * sr))
+    start = max(0, int(start))
+    end = min(len(samples), int(end))
+    n_frames = (end - start) // frame
+    if n_frames < 1:
+        return end
+    frames = np.asarray(samples[start : start + n_frames * frame]).reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+def shard_points(samples, n, sr=SAMPLE_RATE, search_seconds=10.0):
+    """F(x) returns n + 1 sample indices cutting samples into n shards.
+    Each inner cut is the quietest point within search_seconds of an evenly
+    spaced target, so shards rarely split a word.
+    """
+    cuts = [0]
+    for i in range(1, n):
+        target = len(samples) * i // n
+        window = int(search_seconds * sr)
+        cut = quietest_point(samples, target - window, target + window, sr)
+        cuts.append(max(cuts[-1], cut))
+    return cuts + [len(samples)]
+
+
+def ffmpeg_cmd(path_to_audio, sr, sample_format):
+    """F(x) returns the FFmpeg command to decode to mono PCM at sr"""
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", path_to_audio]
+    codec = "pcm_s16le" if sample_format == "s16le" else "pcm_f32le"
+    return cmd + ["-f", sample_format, "-ac", "1", "-acodec", codec, "-ar", str(sr)]
+
+
+def as_pyannote(audio):
+    """F(x) wraps a decoded audio as pyannote input, sharing its memory"""
+    import torch
+
+    waveform = torch.from_numpy(audio["samples"]).unsqueeze(0)
+    return {"waveform": waveform, "sample_rate": audio["sample_rate"]}
+
+
+# ---------------------
+# SLICING
+# ...
+def slice_audio(audio, CHUNKS, approach, sr=SAMPLE_RATE):
+    """F(x) cuts a decoded audio into the same chunks split_audio writes to disk.
+    Each chunk runs from its start to the start of the next one (or the end).
+    Slices are NumPy views, so nothing is copied.
+    """
+    column = 0 if approach == "segmentation" else 1
+    starts = [max(0, int(chunk[column] * sr)) for chunk in CHUNKS]
+    ends = starts[1:] + [len(audio)]
+    return [audio[start:end] for start, end in zip(starts, ends)]
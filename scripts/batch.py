@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Headless batch transcriptions, for when the GUI is not around.
+Usage (from the root of the repository):
+    python -m scripts.batch path/to/folder_or_manifest.txt --accept-terms [options]
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import time
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".mp4", ".m4a", ".flac", ".wma", ".aac", ".ogg")
+
+
+# ---------------------
+# BATCH FLOW
+# ...
+def batch_flow(paths, settings, HPs={}, workers=1, threads=0, opts={}):
+    """F(x) transcribes many audios across a pool of worker processes.
+    Each worker loads its model once and reuses it for all files it gets.
+    """
+
+    # FUNCTION IMPORTS
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    # ANNOUNCE START
+    print(f"[LKL|MSG] Transcribing {len(paths)} audio(s) using {workers} worker(s).")
+
+    # RUN POOL
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(settings, threads, opts),
+    ) as pool:
+        jobs = {pool.submit(transcribe_one, path, settings, HPs, opts): path for path in paths}
+        for job in as_completed(jobs):
+            try:
+                path, message, done, duration = job.result()
+            except Exception as e:
+                path, message, done, duration = jobs[job], f"Worker failed: {e}", 0, 0
+            print(f"[LKL|MSG] {'OK' if done == 1 else 'FAILED'} ({duration:.0f}s) {path}: {message}")
+            results.append([path, message, done, duration])
+
+    # RETURN ONE [path, message, done, seconds] ENTRY PER AUDIO
+    return results
+
+
+# ---------------------
+# WORKER FUNCTIONS
+# ...
+def init_worker(settings, threads, opts={}):
+    """F(x) runs once per worker process: caps threads and warms the model
+    registry, so every file the worker gets reuses the same loaded model.
+    Faster Whisper jobs on replicas never use the main model, so it is not
+    loaded for them (replicas load on the first job and stay warm).
+    """
+
+    # THREADS PER WORKER (0 leaves libraries to decide)
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    # MODEL (same registry key the jobs will ask for, compute type included)
+    if not on_replicas(settings, opts):
+        warm_model(settings, threads, compute_type=opts.get("compute_type", ""))
+
+
+def on_replicas(settings, opts):
+    """F(x) tells if Faster Whisper jobs run on model replicas instead of the
+    main model: segments shared out (loop/windows) or simple-mode shards,
+    unless batched decoding takes over
+    """
+    if settings["family"] != "systran" or opts.get("batch_size", 1) > 1:
+        return False
+    if settings["approach"] == "simple":
+        return opts.get("shards", 1) > 1
+    one_pass = opts.get("diarisation_strategy") == "one_pass" and settings["approach"] == "diarisation"
+    return opts.get("replicas", 1) > 1 and not one_pass
+
+
+def warm_model(settings, threads=0, replica=0, compute_type=""):
+    """F(x) returns the model (or HF pipeline) for some settings, loading it
+    into the registry if it is not there yet. Replicas get copies of their own.
+    compute_type (Faster Whisper only) is part of the registry key.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.transcribe_hf import get_pipe
+    from scripts.transcribe_owfw import get_model
+
+    family, model_size, gpu = settings["family"], settings["model"], settings["gpu_on"]
+    if "_hf" in family:
+        return get_pipe(family, model_size, gpu, replica)
+    return get_model(
+        family, model_size, gpu, cpu_threads=threads, replica=replica, compute_type=compute_type
+    )
+
+
+def transcribe_one(path_to_audio, settings, HPs, opts={}):
+    """F(x) transcribes a single audio inside a worker process."""
+
+    # FUNCTION IMPORTS
+    from scripts.lokal_transcribe import transcription_flow
+
+    # KEY SETTINGS
+    start_time = time.time()
+    filename = os.path.basename(path_to_audio).rsplit(".", 1)[0]
+    message, done = "Transcription failed.", 0
+
+    # OPTIONAL STREAMING DECODE (non-WAV audios go straight from FFmpeg to the models)
+    opts = audio_opts(path_to_audio, opts)
+
+    # TRANSCRIPTION (every job gets a workspace of its own)
+    try:
+        message, done = transcription_flow(
+            {**settings, "path_to_audio": path_to_audio}, filename, HPs, opts=opts
+        )
+    except Exception as e:
+        message = f"Transcription failed: {e}"
+
+    return path_to_audio, message, done, time.time() - start_time
+
+
+# ---------------------
+# ASSISTIVE FUNCTIONS
+# ...
+def find_audios(source):
+    """F(x) lists audios in a folder or in a manifest (one path per line)."""
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(source, f)
+            for f in sorted(os.listdir(source))
+            if f.lower().endswith(AUDIO_EXTENSIONS)
+        ]
+    else:
+        with open(source, "r") as f:
+            paths = [
+                line.strip()
+                for line in f.readlines()
+                if line.strip() != "" and not line.startswith("#")
+            ]
+            f.close()
+    return [path.replace("\\", "/") for path in paths]
+
+
+def audio_opts(path_to_audio, opts={}):
+    """F(x) decodes non-WAV audios on the fly unless opts say otherwise."""
+    if not path_to_audio.endswith(".wav"):
+        return {"in_memory": True, "memmap": True, "stream": True, **opts}
+    return opts
+
+
+def make_HPs(approach, min_duration_on=1.5, min_duration_off=0.5, speakers="AUTO"):
+    """F(x) builds the hyper-parameters dictionary used by the GUI."""
+    HPs = {}
+    if approach == "segmentation":
+        HPs = {"min_duration_on": min_duration_on, "min_duration_off": min_duration_off}
+    if approach == "diarisation":
+        HPs = {"min_duration_off": min_duration_off, "speaker_num": speakers}
+    return HPs
+
+
+def make_settings(family, model_size, approach, language, timestamps, gpu):
+    """F(x) builds a settings dictionary in the exact shape used by the GUI."""
+    return {
+        "path_to_audio": "",
+        "path_to_prompt": "",
+        "family": family,
+        "model": model_size,
+        "approach": approach,
+        "language": language,
+        "timestamps_on": timestamps,
+        "gpu_on": gpu,
+        "tcs_ok": True,
+    }
+
+
+def main(argv=None):
+    """F(x) parses command line arguments and launches the batch."""
+
+    # FUNCTION IMPORTS
+    import argparse
+    from scripts.utils import FAMILIES, MODEL_SIZES, TYPES
+
+    # ARGUMENTS
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.batch",
+        description="LOKAL: transcribe many audios without the GUI.",
+    )
+    parser.add_argument("source", help="folder with audios or TXT manifest with one path per line")
+    parser.add_argument("--family", default="systran", choices=list(FAMILIES.values()))
+    parser.add_argument("--model", default="tiny", help="model size, e.g. tiny, base, small")
+    parser.add_argument("--approach", default="simple", choices=TYPES)
+    parser.add_argument("--language", default="AUTO")
+    parser.add_argument("--timestamps", action="store_true")
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per worker (0 = share cores evenly)")
+    parser.add_argument("--min-duration-on", type=float, default=1.5, help="segmentation: ignore short segments (s)")
+    parser.add_argument("--min-duration-off", type=float, default=0.5, help="segmentation/diarisation: ignore short pauses (s)")
+    parser.add_argument("--speakers", default="AUTO", help="diarisation: number of speakers")
+    parser.add_argument("--in-memory", action="store_true", help="decode each audio once and keep it in memory")
+    parser.add_argument("--memmap", action="store_true", help="with --in-memory, memory-map the decoded audio from disk")
+    parser.add_argument("--stream", action="store_true", help="simple mode: transcribe while FFmpeg decodes")
+    parser.add_argument("--batch-size", type=int, default=1, help="segments or 30s windows decoded together")
+    parser.add_argument("--replicas", type=int, default=1, help="segmentation/diarisation: model copies per worker running segments in parallel")
+    parser.add_argument("--shards", type=int, default=1, help="simple: cut the audio at quiet points and transcribe shards concurrently")
+    parser.add_argument("--beam-size", type=int, default=0, help="beams per decode (0 = default: 3 on CPU, 5 on GPU for Faster Whisper, greedy otherwise)")
+    parser.add_argument("--compute-type", default="", help="Faster Whisper weights, e.g. int8, int8_float32, float16, float32")
+    parser.add_argument("--pack", action="store_true", help="segmentation: transcribe regions packed in 30s windows")
+    parser.add_argument("--one-pass", action="store_true", help="diarisation: transcribe once, align words to turns")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not fill the on-disk cache")
+    parser.add_argument("--no-resume", action="store_true", help="segmentation/diarisation: do not checkpoint or resume jobs")
+    parser.add_argument("--no-trace", action="store_true", help="do not write per-stage traces to ~/LOKAL_traces")
+    parser.add_argument("--ram-workspace", action="store_true", help="keep temp files in RAM (/dev/shm) when there is room")
+    parser.add_argument("--workspace-quota", type=float, default=0, help="MB of temp files allowed per job (0 = no cap)")
+    parser.add_argument("--accept-terms", action="store_true", help="accept LOKAL's terms & conditions")
+    args = parser.parse_args(argv)
+
+    # CHECKS
+    if not args.accept_terms:
+        parser.error("You need to accept the terms and conditions (--accept-terms).")
+    if args.model not in MODEL_SIZES[args.family]:
+        parser.error(f"Model size for {args.family} must be one of {MODEL_SIZES[args.family]}.")
+
+    # SETTINGS AND HYPER-PARAMETERS (same shape as the GUI)
+    language = args.language if args.language.upper() == "AUTO" else args.language.lower()
+    settings = make_settings(
+        args.family, args.model, args.approach, language, args.timestamps, args.gpu
+    )
+    HPs = make_HPs(
+        args.approach, args.min_duration_on, args.min_duration_off, args.speakers
+    )
+
+    # RUN
+    paths = find_audios(args.source)
+    if len(paths) == 0:
+        print("[LKL|MSG] No audios found.")
+        return 1
+    workers = max(1, min(args.workers, len(paths)))
+    threads = args.threads if args.threads > 0 else max(1, (os.cpu_count() or 1) // workers)
+    opts = {
+        "batch_size": args.batch_size,
+        "beam_size": max(0, args.beam_size),
+        "compute_type": args.compute_type,
+        "replicas": max(1, args.replicas),
+        "shards": max(1, args.shards),
+        "pack": args.pack,
+        "diarisation_strategy": "one_pass" if args.one_pass else "turns",
+        "cache": not args.no_cache,
+        "resume": not args.no_resume,
+        "trace": not args.no_trace,
+        "workspace_ram": args.ram_workspace,
+        "workspace_quota_mb": args.workspace_quota,
+    }
+
+    # Decoding flags only if given: otherwise non-WAV audios stream (see audio_opts)
+    for key, flag in [("in_memory", args.in_memory), ("memmap", args.memmap), ("stream", args.stream)]:
+        if flag:
+            opts[key] = True
+    results = batch_flow(paths, settings, HPs, workers, threads, opts)
+    failed = [r for r in results if r[2] != 1]
+    print(f"[LKL|MSG] Finished: {len(results) - len(failed)} done, {len(failed)} failed.")
+    return 0 if len(failed) == 0 else 1
+
+
+# ---------------------
+# NAME:MAIN?
+# ...
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Real-time-factor benchmark: every family, model size and approach whose
+models are already on disk, over a fixed corpus of audios. Runs offline.
+Usage (from the root of the repository):
+    python -m scripts.benchmark --accept-terms [options]
+
+Reports, per combination:
+  - RTF: processing seconds per second of audio (model loading excluded),
+  - model load time (Whisper family plus pyannote, if used),
+  - peak memory (each combination runs in a fresh process),
+  - segments per second.
+Results print as a table and go to a JSON file. Pass an earlier JSON with
+--compare to flag combinations that got slower.
+
+Without --corpus, a synthetic corpus (speech-like tones with pauses) is
+generated once. It is enough to compare versions and settings; real
+recordings give more realistic figures.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import time
+
+CORPUS_DIR = os.path.join(os.path.expanduser("~"), "LOKAL_benchmark")
+
+# Synthetic corpus: one audio per duration (seconds)
+CORPUS_SECONDS = [30, 120, 600]
+
+
+# ---------------------
+# BENCHMARK FLOW
+# ...
+def benchmark_flow(paths, families, sizes, approaches, language, gpu, opts={}):
+    """F(x) runs every locally available combination over the corpus, each in
+    a fresh process (clean memory figures, cold model loads). Returns rows.
+    """
+
+    # FUNCTION IMPORTS
+    from concurrent.futures import ProcessPoolExecutor
+
+    rows = []
+    for family in families:
+        for model_size in sizes[family]:
+            for approach in approaches:
+                row = {"family": family, "model": model_size, "approach": approach}
+                missing = missing_models(family, model_size, approach)
+                if missing != "":
+                    rows.append({**row, "status": f"not available ({missing})"})
+                    print(f"[LKL|MSG] Skipping {family}/{model_size}/{approach}: {missing} not on disk.")
+                    continue
+                print(f"[LKL|MSG] Benchmarking {family}/{model_size}/{approach}.")
+                try:
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        result = pool.submit(
+                            run_combination, paths, family, model_size, approach, language, gpu, opts
+                        ).result()
+                    rows.append({**row, **result})
+                except Exception as e:
+                    rows.append({**row, "status": f"failed: {e}"})
+                print_rows(rows[-1:], header=False)
+    return rows
+
+
+def run_combination(paths, family, model_size, approach, language, gpu, opts={}):
+    """F(x) transcribes the corpus with one combination (in its own process)"""
+
+    # FUNCTION IMPORTS
+    from scripts.batch import audio_opts, make_HPs, make_settings
+    from scripts.lokal_transcribe import transcription_job
+    from scripts.trace import leave, peak_rss_mb, start_trace, summary
+    from scripts.utils import calc_audio_length
+
+    # SETTINGS (no cache, checkpoints or TXT files: every run does the full work)
+    language = "english" if family == "distil-whisper_hf" else language
+    settings = make_settings(family, model_size, approach, language, False, gpu)
+    HPs = make_HPs(approach)
+    opts = {**opts, "cache": False, "resume": False, "trace": False, "write_txt": False}
+
+    # RUN EACH AUDIO UNDER A TRACE OF ITS OWN
+    audio_s, wall_s, segments, failed = 0.0, 0.0, 0, 0
+    stages = {}
+    for path in paths:
+        seconds = calc_audio_length(path)
+        trace = start_trace(os.path.basename(path), seconds)
+        start_time = time.perf_counter()
+        try:
+            _, done, result = transcription_job(
+                {**settings, "path_to_audio": path},
+                os.path.basename(path).rsplit(".", 1)[0],
+                HPs,
+                opts=audio_opts(path, opts),
+            )
+        except Exception as e:
+            print(f"[LKL|MSG] {path} failed: {e}")
+            done, result = 0, None
+        wall_s += time.perf_counter() - start_time
+        leave()
+
+        # TOTALS
+        audio_s += seconds
+        failed += done != 1
+        if result is not None:
+            segments += len(result.get("segments", result.get("LINES", [])))
+        for name, stage in summary(trace).items():
+            total = stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            for field in total:
+                total[field] += stage[field]
+    load_s = stages.get("model_load", {}).get("wall_s", 0.0)
+
+    work_s = max(wall_s - load_s, 1e-9)
+    return {
+        "status": "ok" if failed == 0 else f"{failed} failed",
+        "language": language,
+        "gpu": gpu,
+        "files": len(paths),
+        "audio_s": audio_s,
+        "load_s": load_s,
+        "wall_s": wall_s,
+        "rtf": work_s / audio_s if audio_s > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "segments": segments,
+        "segments_per_s": segments / work_s,
+        "stages": stages,
+    }
+
+
+# ---------------------
+# AVAILABILITY (offline: only models already on disk)
+# ...
+def missing_models(family, model_size, approach):
+    """F(x) names the first model a combination needs that is not on disk
+    ("" if everything is there). Looks where the loaders download to.
+    """
+    import glob
+    from scripts.assist import resource_path
+    from scripts.transcribe_hf import hf_model_id
+
+    root = resource_path(f"./models/{family}")
+    if family == "systran":
+        pattern = f"models--Systran--faster-whisper-{model_size}*"
+    elif family == "openai":
+        pattern = f"{model_size}*.pt"
+    else:
+        pattern = "models--" + hf_model_id(family, model_size).replace("/", "--")
+    if len(glob.glob(os.path.join(root, pattern))) == 0:
+        return f"{family} {model_size}"
+
+    needs = {"segmentation": ["segmentation"], "diarisation": ["segmentation", "embedding"]}
+    for name in needs.get(approach, []):
+        if not os.path.isfile(resource_path(f"models/{name}/pytorch_model.bin")):
+            return f"pyannote {name}"
+    return ""
+
+
+# ---------------------
+# CORPUS
+# ...
+def make_corpus(folder=CORPUS_DIR, durations=CORPUS_SECONDS, seed=0):
+    """F(x) writes (once) one synthetic speech-like WAV per duration and
+    returns their paths. Same seed, same audio: runs stay comparable.
+    """
+    import wave
+    import numpy as np
+
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for seconds in durations:
+        path = os.path.join(folder, f"synthetic-{seconds}s.wav").replace("\\", "/")
+        if not os.path.isfile(path):
+            samples = speech_like(seconds, np.random.default_rng(seed + seconds))
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(16000)
+                f.writeframes((samples * 32767).astype(np.int16).tobytes())
+        paths.append(path)
+    return paths
+
+
+def speech_like(seconds, rng, sr=16000):
+    """F(x) builds phrases of voiced syllables (harmonics over a gliding
+    pitch) and noisy consonants, separated by pauses of varying length
+    """
+    import numpy as np
+
+    out = np.zeros(int(seconds * sr), dtype=np.float32)
+    t = 0.0
+    while t < seconds:
+        phrase_end = min(seconds, t + rng.uniform(1.5, 6.0))
+        while t < phrase_end:
+            # Consonant: short noise burst
+            n = int(rng.uniform(0.03, 0.08) * sr)
+            start = int(t * sr)
+            burst = rng.normal(0, 0.15, n) * np.hanning(n)
+            out[start : start + n] += burst[: len(out[start : start + n])]
+            t += n / sr
+
+            # Vowel: harmonics of a gliding pitch, formant-like emphasis
+            n = int(rng.uniform(0.1, 0.3) * sr)
+            start = int(t * sr)
+            f0 = rng.uniform(100, 220) * np.linspace(1.0, rng.uniform(0.85, 1.15), n)
+            phase = 2 * np.pi * np.cumsum(f0) / sr
+            formant = rng.uniform(2, 6)
+            vowel = sum(np.sin(k * phase) / (1 + abs(k - formant)) for k in range(1, 12))
+            vowel = vowel * np.hanning(n)
+            out[start : start + n] += vowel[: len(out[start : start + n])].astype(np.float32)
+            t += n / sr
+        t += rng.uniform(0.2, 1.2)
+
+    return 0.3 * out / max(1e-9, np.abs(out).max())
+
+
+# ---------------------
+# REPORTS
+# ...
+def print_rows(rows, header=True):
+    """F(x) prints results as a fixed-width table"""
+    columns = ["family", "model", "approach", "audio_s", "load_s", "rtf", "peak_rss_mb", "segments_per_s", "status"]
+    titles = ["FAMILY", "SIZE", "APPROACH", "AUDIO s", "LOAD s", "RTF", "PEAK MB", "SEG/s", "STATUS"]
+    widths = [18, 7, 13, 9, 8, 7, 9, 7, 0]
+    if header:
+        print("".join(t.ljust(w) for t, w in zip(titles, widths)))
+    for row in rows:
+        cells = []
+        for column, width in zip(columns, widths):
+            value = row.get(column, "")
+            if isinstance(value, float):
+                decimals = {"rtf": 2, "segments_per_s": 2, "load_s": 1}.get(column, 0)
+                value = f"{value:.{decimals}f}"
+            cells.append(str("-" if value is None else value).ljust(width))
+        print("".join(cells))
+
+
+def compare(rows, previous, tolerance=0.10):
+    """F(x) prints RTF changes against an earlier run; returns regressions
+    (combinations over tolerance slower)
+    """
+    before = {(r["family"], r["model"], r["approach"]): r for r in previous["results"]}
+    regressions = []
+    print(f"\n[LKL|MSG] Against {previous.get('label') or 'earlier run'}:")
+    for row in rows:
+        old = before.get((row["family"], row["model"], row["approach"]))
+        if old is None or not old.get("rtf") or not row.get("rtf"):
+            continue
+        change = row["rtf"] / old["rtf"] - 1
+        flag = "  << SLOWER" if change > tolerance else ""
+        print(f"  {row['family']}/{row['model']}/{row['approach']}: RTF {old['rtf']:.2f} -> {row['rtf']:.2f} ({change:+.0%}){flag}")
+        if change > tolerance:
+            regressions.append(row)
+    return regressions
+
+
+def machine_info():
+    """F(x) describes the machine and library versions behind a run"""
+    import platform
+    from importlib import metadata
+
+    versions = {}
+    for name in ["faster-whisper", "ctranslate2", "openai-whisper", "transformers", "torch", "pyannote.audio"]:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "libraries": versions,
+    }
+
+
+def main(argv=None):
+    """F(x) parses command line arguments and runs the benchmark."""
+
+    # FUNCTION IMPORTS
+    import argparse
+    from scripts.batch import find_audios
+    from scripts.utils import FAMILIES, MODEL_SIZES, TYPES, calc_audio_length
+
+    # ARGUMENTS
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.benchmark",
+        description="LOKAL: real-time factor of every family, size and approach available offline.",
+    )
+    parser.add_argument("--corpus", default="", help="folder or TXT manifest of audios (default: synthetic corpus)")
+    parser.add_argument("--families", nargs="+", default=list(FAMILIES.values()), choices=list(FAMILIES.values()))
+    parser.add_argument("--sizes", nargs="+", default=[], help="model sizes to try (default: all)")
+    parser.add_argument("--approaches", nargs="+", default=TYPES, choices=TYPES)
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--opts", default="{}", help='performance options as JSON, e.g. \'{"in_memory": true, "batch_size": 8}\'')
+    parser.add_argument("--label", default="", help="name for this run, e.g. the LOKAL version")
+    parser.add_argument("--output", default="lokal-benchmark.json")
+    parser.add_argument("--compare", default="", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="RTF increase counted as a regression")
+    parser.add_argument("--accept-terms", action="store_true", help="accept LOKAL's terms & conditions")
+    args = parser.parse_args(argv)
+
+    # CHECKS
+    if not args.accept_terms:
+        parser.error("You need to accept the terms and conditions (--accept-terms).")
+
+    # OFFLINE: libraries must use what is on disk (child processes inherit this)
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    # CORPUS
+    paths = find_audios(args.corpus) if args.corpus != "" else make_corpus()
+    if len(paths) == 0:
+        print("[LKL|MSG] No audios found.")
+        return 1
+
+    # RUN
+    sizes = {
+        family: [s for s in MODEL_SIZES[family] if len(args.sizes) == 0 or s in args.sizes]
+        for family in args.families
+    }
+    print_rows([])
+    rows = benchmark_flow(
+        paths, args.families, sizes, args.approaches, args.language.lower(), args.gpu, json.loads(args.opts)
+    )
+
+    # REPORT
+    print("")
+    print_rows(rows)
+    report = {
+        "label": args.label,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": machine_info(),
+        "opts": json.loads(args.opts),
+        "corpus": [{"path": path, "seconds": calc_audio_length(path)} for path in paths],
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1, default=float)
+        f.close()
+    print(f"[LKL|MSG] Results saved to {args.output}")
+
+    # REGRESSIONS
+    if args.compare != "":
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+        if len(compare(rows, previous, args.tolerance)) > 0:
+            return 1
+    return 0
+
+
+# ---------------------
+# NAME:MAIN?
+# ...
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
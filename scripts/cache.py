@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+On-disk cache for expensive intermediate results (VAD scores and the like).
+Entries are addressed by content: the hash of the audio bytes plus whatever
+else the result depends on (model, settings), never by file name or path.
+Cache lives in ~/LOKAL_cache unless LOKAL_CACHE_DIR says otherwise, and is
+capped at LOKAL_CACHE_MB (least recently used entries go first).
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import hashlib
+
+CACHE_DIR = os.environ.get(
+    "LOKAL_CACHE_DIR", os.path.join(os.path.expanduser("~"), "LOKAL_cache")
+)
+
+# Size cap (MB) for everything in the cache
+BUDGET = {"mb": float(os.environ.get("LOKAL_CACHE_MB", 4096))}
+
+# Hashes already computed: (path, size, mtime) -> hex digest
+HASHES = {}
+
+# Lookups per kind of entry: kind -> {"hits": n, "misses": n}, plus evictions
+STATS = {"evictions": 0}
+
+
+# ---------------------
+# KEYS
+# ...
+def content_hash(path, block_size=1 << 20):
+    """F(x) returns the SHA-256 of a file's bytes (memoised per file version)"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key in HASHES:
+        return HASHES[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+        f.close()
+
+    HASHES[memo_key] = digest.hexdigest()
+    return HASHES[memo_key]
+
+
+def array_hash(array):
+    """F(x) returns the SHA-256 of an array's samples (e.g. an audio chunk)"""
+    import numpy as np
+
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def make_key(*parts):
+    """F(x) folds any parts (hashes, model names, settings) into one key"""
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def cache_file(kind, key, extension):
+    """F(x) returns the path of an entry, creating its folder if needed"""
+    folder = os.path.join(CACHE_DIR, kind)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{key}.{extension}")
+
+
+# ---------------------
+# ARRAYS & METADATA
+# ...
+def save_array(kind, key, array, meta={}):
+    """F(x) stores an array (.npy) plus a small JSON of metadata.
+    Files are written aside and renamed, so readers never see half an entry.
+    """
+    import numpy as np
+
+    path = cache_file(kind, key, "npy")
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+        f.close()
+    write_json(kind, key, meta)
+    os.replace(path + ".tmp", path)
+    evict()
+
+
+def load_array(kind, key, mmap=False):
+    """F(x) returns (array, metadata) for an entry, or (None, None) if missing.
+    With mmap, the array is memory-mapped instead of read into RAM
+    (copy-on-write: callers may modify it, the file never changes).
+    """
+    import numpy as np
+
+    path = cache_file(kind, key, "npy")
+    if not os.path.isfile(path):
+        count(kind, hit=False)
+        return None, None
+    try:
+        array = np.load(path, mmap_mode="c" if mmap else None)
+        meta = read_json(kind, key, counted=False) or {}
+    except Exception:
+        count(kind, hit=False)
+        return None, None
+    count(kind, hit=True)
+    touch(path)
+    return array, meta
+
+
+def write_json(kind, key, data):
+    """F(x) stores any JSON-friendly data (NumPy floats included)"""
+    path = cache_file(kind, key, "json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, default=float)
+        f.close()
+    os.replace(path + ".tmp", path)
+
+
+def read_json(kind, key, counted=True):
+    """F(x) returns the data of an entry, or None if missing"""
+    path = cache_file(kind, key, "json")
+    data = None
+    if os.path.isfile(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            touch(path)
+        except Exception:
+            data = None
+    if counted:
+        count(kind, hit=data is not None)
+    return data
+
+
+# ---------------------
+# SIZE CAP & STATISTICS
+# ...
+def touch(path):
+    """F(x) marks an entry as recently used (modification time is the LRU clock)"""
+    import time
+
+    try:
+        os.utime(path, (time.time(), time.time()))
+    except Exception:
+        pass
+
+
+def evict():
+    """F(x) deletes least recently used entries until the cache fits its budget.
+    An entry is all files sharing a name (e.g. .npy data and its .json).
+    """
+    entries = {}
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stem = path.rsplit(".", 1)[0]
+            size, used = entries.get(stem, (0, 0.0))
+            entries[stem] = (size + stat.st_size, max(used, stat.st_mtime))
+
+    total = sum(size for size, _ in entries.values())
+    budget = BUDGET["mb"] * 1024**2
+    for stem, (size, _) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+        if total <= budget:
+            break
+        for extension in ["npy", "json"]:
+            try:
+                os.remove(f"{stem}.{extension}")
+            except OSError:
+                pass
+        total -= size
+        STATS["evictions"] += 1
+
+
+def count(kind, hit):
+    counts = STATS.setdefault(kind, {"hits": 0, "misses": 0})
+    counts["hits" if hit else "misses"] += 1
+
+
+def stats():
+    """F(x) returns hits, misses and hit rate per kind of entry"""
+    report = {"evictions": STATS["evictions"]}
+    for kind, counts in STATS.items():
+        if kind == "evictions":
+            continue
+        lookups = counts["hits"] + counts["misses"]
+        report[kind] = {
+            **counts,
+            "hit_rate": counts["hits"] / lookups if lookups > 0 else 0.0,
+        }
+    return report
+
+
+def clear(kind=""):
+    """F(x) deletes all entries of a kind (or the whole cache)"""
+    import shutil
+
+    shutil.rmtree(os.path.join(CACHE_DIR, kind), ignore_errors=True)
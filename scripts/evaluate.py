@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Speed versus accuracy: runs pipeline variants (family, size, beam size,
+compute type, approach) over audios with reference transcripts, scores
+them and shows which variants are worth it (the Pareto frontier: nothing
+else is both faster and more accurate). Runs offline.
+Usage (from the root of the repository):
+    python -m scripts.evaluate path/to/references --accept-terms [options]
+
+The references folder holds audios plus, for each one:
+  - name.ref.txt: what was said (plain text), for WER and CER,
+  - name.rttm (optional): who spoke when, for DER (diarisation only).
+
+Scores:
+  - WER/CER: word/character edits over reference length, after
+    lowercasing and dropping punctuation,
+  - DER: diarisation error rate (pyannote.metrics),
+  - RTF: processing seconds per second of audio (model loading excluded).
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import time
+
+
+# ---------------------
+# EVALUATION FLOW
+# ...
+def evaluate_flow(paths, variants, language, gpu, opts={}):
+    """F(x) runs each variant over the audios (in a fresh process each) and
+    scores it against the references. Returns one row per variant.
+    """
+
+    # FUNCTION IMPORTS
+    from concurrent.futures import ProcessPoolExecutor
+    from scripts.benchmark import missing_models
+
+    rows = []
+    for variant in variants:
+        row = {"variant": describe(variant), **variant}
+        missing = missing_models(variant["family"], variant["model"], variant["approach"])
+        if missing != "":
+            print(f"[LKL|MSG] Skipping {row['variant']}: {missing} not on disk.")
+            rows.append({**row, "status": f"not available ({missing})"})
+            continue
+        print(f"[LKL|MSG] Evaluating {row['variant']}.")
+        try:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                run = pool.submit(run_variant, paths, variant, language, gpu, opts).result()
+            rows.append({**row, **score(run, variant["approach"])})
+        except Exception as e:
+            rows.append({**row, "status": f"failed: {e}"})
+    return rows
+
+
+def run_variant(paths, variant, language, gpu, opts={}):
+    """F(x) transcribes every audio with one variant (in its own process).
+    Returns, per audio, its length, time taken, text and speaker turns.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.batch import audio_opts, make_HPs, make_settings
+    from scripts.lokal_transcribe import transcription_job
+    from scripts.service import to_segments
+    from scripts.trace import leave, start_trace, summary
+    from scripts.utils import calc_audio_length
+
+    # SETTINGS (no cache, checkpoints or TXT files: every run does the full work)
+    family, approach = variant["family"], variant["approach"]
+    language = "english" if family == "distil-whisper_hf" else language
+    settings = make_settings(family, variant["model"], approach, language, False, gpu)
+    opts = {
+        **opts,
+        "beam_size": variant.get("beam_size", 0),
+        "compute_type": variant.get("compute_type", ""),
+        "cache": False,
+        "resume": False,
+        "trace": False,
+        "write_txt": False,
+    }
+
+    # TRANSCRIBE
+    files, load_s = [], 0.0
+    for path in paths:
+        seconds = calc_audio_length(path)
+        trace = start_trace(os.path.basename(path), seconds)
+        start_time = time.perf_counter()
+        try:
+            _, done, result = transcription_job(
+                {**settings, "path_to_audio": path},
+                os.path.basename(path).rsplit(".", 1)[0],
+                make_HPs(approach),
+                opts=audio_opts(path, opts),
+            )
+        except Exception as e:
+            print(f"[LKL|MSG] {path} failed: {e}")
+            done, result = 0, None
+        wall_s = time.perf_counter() - start_time
+        leave()
+        load_s += summary(trace).get("model_load", {}).get("wall_s", 0.0)
+
+        segments = to_segments(result, approach) if done == 1 else []
+        files.append(
+            {
+                "path": path,
+                "seconds": seconds,
+                "wall_s": wall_s,
+                "done": done,
+                "text": " ".join(s["text"] for s in segments),
+                "turns": [
+                    [s["speaker"], s["start"], s["end"] if s["end"] is not None else seconds]
+                    for s in segments
+                    if "speaker" in s
+                ],
+            }
+        )
+
+    return {"files": files, "load_s": load_s}
+
+
+# ---------------------
+# SCORES
+# ...
+def score(run, approach):
+    """F(x) scores a variant's run: corpus WER/CER (total edits over total
+    reference length), DER where RTTMs exist, and RTF
+    """
+    word_edits = words = char_edits = chars = 0
+    audio_s = sum(f["seconds"] for f in run["files"])
+    wall_s = sum(f["wall_s"] for f in run["files"])
+    der_metric = None
+    for file in run["files"]:
+        stem = file["path"].rsplit(".", 1)[0]
+
+        # WER/CER
+        with open(stem + ".ref.txt", "r", encoding="utf-8") as f:
+            reference = normalise(f.read())
+        hypothesis = normalise(file["text"])
+        word_edits += edit_distance(reference.split(), hypothesis.split())
+        words += len(reference.split())
+        char_edits += edit_distance(reference, hypothesis)
+        chars += len(reference)
+
+        # DER
+        if approach == "diarisation" and os.path.isfile(stem + ".rttm"):
+            from pyannote.metrics.diarization import DiarizationErrorRate
+
+            der_metric = der_metric or DiarizationErrorRate()
+            der_metric(load_reference_turns(stem + ".rttm"), as_annotation(file["turns"]))
+
+    failed = sum(f["done"] != 1 for f in run["files"])
+    work_s = max(wall_s - run["load_s"], 1e-9)
+    return {
+        "status": "ok" if failed == 0 else f"{failed} failed",
+        "audio_s": audio_s,
+        "load_s": run["load_s"],
+        "rtf": work_s / audio_s if audio_s > 0 else None,
+        "wer": word_edits / max(1, words),
+        "cer": char_edits / max(1, chars),
+        "der": abs(der_metric) if der_metric is not None else None,
+    }
+
+
+def normalise(text):
+    """F(x) lowercases text and keeps only words (letters, digits, apostrophes)"""
+    import re
+
+    return " ".join(re.findall(r"[\w']+", text.lower()))
+
+
+def edit_distance(reference, hypothesis):
+    """F(x) returns the Levenshtein distance between two sequences (words or
+    characters). Bit-parallel (Myers/Hyyro): one pass over the hypothesis,
+    each step a handful of integer operations, so long transcripts are cheap.
+    """
+    if len(reference) == 0:
+        return len(hypothesis)
+
+    # One bit per reference position, set where each token occurs
+    m = len(reference)
+    mask, high = (1 << m) - 1, 1 << (m - 1)
+    peq = {}
+    for i, token in enumerate(reference):
+        peq[token] = peq.get(token, 0) | (1 << i)
+
+    # Vertical deltas (+1/-1) of the DP column, updated token by token
+    pv, mv, distance = mask, 0, m
+    for token in hypothesis:
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            distance += 1
+        elif mh & high:
+            distance -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return distance
+
+
+def load_reference_turns(path_to_rttm):
+    """F(x) reads who spoke when from an RTTM file (first recording in it)"""
+    from pyannote.database.util import load_rttm
+
+    return next(iter(load_rttm(path_to_rttm).values()))
+
+
+def as_annotation(turns):
+    """F(x) turns [speaker, start, end] lists into a pyannote Annotation"""
+    from pyannote.core import Annotation, Segment
+
+    annotation = Annotation()
+    for speaker, start, end in turns:
+        if end > start:
+            annotation[Segment(start, end)] = speaker
+    return annotation
+
+
+# ---------------------
+# FRONTIER
+# ...
+def pareto(rows, metric="wer"):
+    """F(x) returns variants nothing else beats on both speed and accuracy,
+    fastest first
+    """
+    scored = [r for r in rows if r.get("rtf") is not None and r.get(metric) is not None]
+    frontier, best = [], float("inf")
+    for row in sorted(scored, key=lambda r: (r["rtf"], r[metric])):
+        if row[metric] < best:
+            frontier.append(row)
+            best = row[metric]
+    return frontier
+
+
+def print_rows(rows, frontier, metric="wer"):
+    """F(x) prints variants as a table, fastest first; * marks the frontier"""
+    print(f"\n{'':2}{'VARIANT':48}{'RTF':>7}{'WER':>8}{'CER':>8}{'DER':>8}  STATUS")
+    ids = [id(r) for r in frontier]
+    for row in sorted(rows, key=lambda r: r.get("rtf") or float("inf")):
+        cells = [
+            "-" if row.get(k) is None else (f"{row[k]:.2f}" if k == "rtf" else f"{row[k]:.1%}")
+            for k in ["rtf", "wer", "cer", "der"]
+        ]
+        mark = "*" if id(row) in ids else ""
+        print(f"{mark:2}{row['variant']:48}{cells[0]:>7}{cells[1]:>8}{cells[2]:>8}{cells[3]:>8}  {row['status']}")
+    print(f"\n* Pareto frontier on RTF and {metric.upper()}.")
+
+
+def plot(rows, frontier, metric, path_to_plot):
+    """F(x) saves a speed/accuracy scatter with the frontier drawn in"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    scored = [r for r in rows if r.get("rtf") is not None and r.get(metric) is not None]
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter([r["rtf"] for r in scored], [r[metric] for r in scored], color="grey")
+    ax.plot([r["rtf"] for r in frontier], [r[metric] for r in frontier], "o-", color="black")
+    for row in scored:
+        ax.annotate(row["variant"], (row["rtf"], row[metric]), fontsize=6)
+    ax.set_xlabel("Real-time factor (lower is faster)")
+    ax.set_ylabel(metric.upper())
+    fig.tight_layout()
+    fig.savefig(path_to_plot, dpi=150)
+    plt.close(fig)
+
+
+def describe(variant):
+    compute_type = variant.get("compute_type") or "default"
+    beams = variant.get("beam_size") or "default"
+    return f"{variant['family']}/{variant['model']}/{variant['approach']}/beams {beams}/{compute_type}"
+
+
+def main(argv=None):
+    """F(x) parses command line arguments and runs the evaluation."""
+
+    # FUNCTION IMPORTS
+    import argparse
+    import itertools
+    from scripts.batch import find_audios
+    from scripts.benchmark import machine_info
+    from scripts.utils import FAMILIES, TYPES
+
+    # ARGUMENTS
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.evaluate",
+        description="LOKAL: speed versus accuracy of pipeline variants.",
+    )
+    parser.add_argument("references", help="folder with audios, name.ref.txt transcripts and optional name.rttm files")
+    parser.add_argument("--variants", default="", help='JSON file with a list of variants, e.g. [{"family": "systran", "model": "small", "approach": "simple", "beam_size": 1, "compute_type": "int8"}]')
+    parser.add_argument("--families", nargs="+", default=["systran"], choices=list(FAMILIES.values()))
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--approaches", nargs="+", default=["simple"], choices=TYPES)
+    parser.add_argument("--beam-sizes", nargs="+", type=int, default=[0], help="0 = LOKAL's default")
+    parser.add_argument("--compute-types", nargs="+", default=[""], help="Faster Whisper only, e.g. int8 float32")
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--metric", default="wer", choices=["wer", "cer", "der"], help="accuracy measure for the frontier")
+    parser.add_argument("--max-error", type=float, default=None, help="suggest the fastest variant at or under this error, e.g. 0.15")
+    parser.add_argument("--plot", default="", help="save a speed/accuracy chart (PNG)")
+    parser.add_argument("--output", default="lokal-evaluation.json")
+    parser.add_argument("--accept-terms", action="store_true", help="accept LOKAL's terms & conditions")
+    args = parser.parse_args(argv)
+
+    # CHECKS
+    if not args.accept_terms:
+        parser.error("You need to accept the terms and conditions (--accept-terms).")
+    paths = [
+        p for p in find_audios(args.references) if os.path.isfile(p.rsplit(".", 1)[0] + ".ref.txt")
+    ]
+    if len(paths) == 0:
+        print("[LKL|MSG] No audios with a reference transcript (name.ref.txt) found.")
+        return 1
+
+    # OFFLINE: libraries must use what is on disk (child processes inherit this)
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    # VARIANTS (file, or every combination of the grid flags)
+    if args.variants != "":
+        with open(args.variants, "r") as f:
+            variants = json.load(f)
+    else:
+        variants = [
+            {"family": f, "model": m, "approach": a, "beam_size": b, "compute_type": c}
+            for f, m, a, b, c in itertools.product(
+                args.families, args.sizes, args.approaches, args.beam_sizes, args.compute_types
+            )
+            if not (c != "" and f != "systran")
+        ]
+
+    # RUN & REPORT
+    rows = evaluate_flow(paths, variants, args.language.lower(), args.gpu)
+    frontier = pareto(rows, args.metric)
+    print_rows(rows, frontier, args.metric)
+    if args.max_error is not None:
+        fits = [r for r in frontier if r[args.metric] <= args.max_error]
+        if len(fits) > 0:
+            print(f"[LKL|MSG] Fastest variant within {args.max_error:.0%} {args.metric.upper()}: {fits[0]['variant']}")
+        else:
+            print(f"[LKL|MSG] No variant reaches {args.max_error:.0%} {args.metric.upper()}.")
+    if args.plot != "":
+        plot(rows, frontier, args.metric, args.plot)
+        print(f"[LKL|MSG] Chart saved to {args.plot}")
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "machine": machine_info(),
+                "references": paths,
+                "metric": args.metric,
+                "frontier": [r["variant"] for r in frontier],
+                "results": rows,
+            },
+            f,
+            indent=1,
+            default=float,
+        )
+        f.close()
+    print(f"[LKL|MSG] Results saved to {args.output}")
+    return 0
+
+
+# ---------------------
+# NAME:MAIN?
+# ...
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Checkpoints for segmentation and diarisation jobs, so a job that crashes
+or gets closed half-way resumes where it stopped.
+Each job gets a folder in ~/LOKAL_jobs (never wiped with LOKAL_temp) with:
+  - manifest.json: audio, filename and one entry per chunk with its status,
+  - the segmentation/diarisation result (temp-segments.txt or temp-diary.txt),
+  - one TXT per transcribed chunk.
+The folder is removed once the final transcript is written. Folders of
+abandoned or failed jobs are evicted least recently used first once they
+exceed a disk budget (like the cache).
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import shutil
+
+JOBS_DIR = os.path.join(os.path.expanduser("~"), "LOKAL_jobs")
+
+# Disk budget (MB) for all job folders. Override with LOKAL_JOBS_MB.
+BUDGET = {"mb": float(os.environ.get("LOKAL_JOBS_MB", 1024))}
+
+
+# ---------------------
+# JOB FOLDER
+# ...
+def job_folder(job_id):
+    """F(x) returns the folder of a job, creating it if needed.
+    Marks it as recently used and evicts stale jobs to stay within budget.
+    """
+    path = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(path, exist_ok=True)
+    os.utime(path)
+    evict(keep=job_id)
+    return path
+
+
+def finish_job(path_to_job):
+    """F(x) removes a finished job's folder"""
+    shutil.rmtree(path_to_job, ignore_errors=True)
+
+
+def evict(keep=""):
+    """F(x) deletes least recently used job folders until they fit the budget.
+    A job was last used when its folder or any of its files last changed.
+    The job in keep (the one starting) always stays.
+    """
+    if not os.path.isdir(JOBS_DIR):
+        return
+    jobs = {}
+    for job_id in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, job_id)
+        if not os.path.isdir(path):
+            continue
+        size, used = 0, 0.0
+        try:
+            used = os.stat(path).st_mtime
+            for name in os.listdir(path):
+                stat = os.stat(os.path.join(path, name))
+                size, used = size + stat.st_size, max(used, stat.st_mtime)
+        except OSError:
+            continue
+        jobs[job_id] = (size, used)
+
+    total = sum(size for size, _ in jobs.values())
+    budget = BUDGET["mb"] * 1024**2
+    for job_id, (size, _) in sorted(jobs.items(), key=lambda job: job[1][1]):
+        if total <= budget:
+            break
+        if job_id == keep:
+            continue
+        finish_job(os.path.join(JOBS_DIR, job_id))
+        total -= size
+        print(f"[LKL|VERBOSE] Evicted stale job checkpoint: {job_id}")
+
+
+# ---------------------
+# MANIFEST
+# ...
+def load_manifest(path_to_job):
+    """F(x) returns the job's manifest, or None for a new (or unreadable) job"""
+    try:
+        with open(os.path.join(path_to_job, "manifest.json"), "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def save_manifest(path_to_job, manifest):
+    """F(x) writes the manifest aside and renames it, so it is never half-written"""
+    path = os.path.join(path_to_job, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, default=float)
+        f.close()
+    os.replace(path + ".tmp", path)
+
+
+def new_manifest(path_to_audio, filename, CHUNKS):
+    """F(x) builds the manifest of a new job: every chunk pending"""
+    return {
+        "audio": path_to_audio,
+        "filename": filename,
+        "chunks": [
+            {"index": i, "chunk": list(chunk), "status": "pending", "file": f"{i:06d}.txt"}
+            for i, chunk in enumerate(CHUNKS)
+        ],
+    }
+
+
+# ---------------------
+# CHUNKS
+# ...
+def pending_chunks(path_to_job, manifest):
+    """F(x) lists chunks still to transcribe: not done, or done but whose
+    transcript went missing
+    """
+    return [
+        entry["index"]
+        for entry in manifest["chunks"]
+        if entry["status"] != "done"
+        or not os.path.isfile(os.path.join(path_to_job, entry["file"]))
+    ]
+
+
+def save_chunk(path_to_job, manifest, i, text):
+    """F(x) checkpoints one transcribed chunk: TXT first, then the manifest.
+    Empty results stay pending (they may be failures) and are retried on resume.
+    """
+    entry = manifest["chunks"][i]
+    path = os.path.join(path_to_job, entry["file"])
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+        f.close()
+    os.replace(path + ".tmp", path)
+    entry["status"] = "done" if text.strip() != "" else "empty"
+
+
+def read_chunk(path_to_job, manifest, i):
+    """F(x) returns a chunk's saved transcript ("" if there is none)"""
+    try:
+        with open(os.path.join(path_to_job, manifest["chunks"][i]["file"]), "r") as f:
+            return f.read()
+    except Exception:
+        return ""
@@ -16,20 +16,184 @@ SPDX-License-Identifier: Apache-2.0
 # ...
 import os
 import datetime
-from scripts.assist import resource_path, split_audio, together, write_out
+from scripts.assist import chunk_files, resource_path, split_audio, together, write_out
 
 
 # ---------------------
 # MAIN TRANSCRIPTION FLOW
 # ...
-def transcription_flow(settings, filename, HPs={}):
-    """F(x) calls transcription model and writes result to TXT file"""
+def transcription_flow(settings, filename, HPs={}, model=None, opts={}):
+    """F(x) calls transcription model and writes result to TXT file.
+    Callers transcribing many files can pass an already loaded model
+    (or HF pipeline). Each job works in a workspace of its own, so several
+    jobs can run at the same time; the workspace goes once the job ends.
+    Performance options (see DEFAULT_OPTS in scripts.utils) go in opts.
+    """
+    message, done, _ = transcription_job(settings, filename, HPs, model, opts)
+    return message, done
+
+
+def transcription_job(settings, filename, HPs={}, model=None, opts={}):
+    """F(x) runs transcription_flow and also returns the transcript itself:
+    {"segments": [...]} (simple) or {"LINES": [...]} (segmentation/diarisation).
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.progress import close_channel, open_channel
+    from scripts.trace import finish_trace, start_trace
+    from scripts.utils import DEFAULT_OPTS, calc_audio_length
+    from scripts.workspace import create_workspace, estimate_mb, release_workspace
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
+    # AUDIO LENGTH (sizes the workspace, the trace's real-time factor and progress)
+    try:
+        audio_seconds = calc_audio_length(settings["path_to_audio"])
+    except Exception:
+        audio_seconds = 0.0
+
+    # TRACE of every stage (see scripts.trace)
+    trace = start_trace(filename, audio_seconds) if opts["trace"] else None
+
+    # PROGRESS in audio seconds transcribed (see scripts.progress)
+    channel = open_channel(filename, audio_seconds, settings["path_to_audio"])
+
+    # WORKSPACE for temp audios and partial transcriptions (or memory-mapped audio)
+    # Placeholder if not needed
+    # (same decode condition as job_flow: in memory, packing or sharding)
+    decoding = opts["in_memory"] or opts["pack"] or opts["shards"] > 1
+    memmap = decoding and opts["memmap"]
+    if settings["approach"] != "simple" or memmap:
+        path_to_temp_folder = create_workspace(
+            opts["workspace_ram"],
+            opts["workspace_quota_mb"],
+            estimate_mb(audio_seconds, memmap),
+        )
+    else:
+        path_to_temp_folder = ""
+
+    # RUN JOB, THEN REMOVE WORKSPACE (even if the job fails), CLOSE TRACE AND PROGRESS
+    done = 0
+    try:
+        message, done, result = job_flow(
+            settings, filename, HPs, model, opts, path_to_temp_folder
+        )
+        return message, done, result
+    finally:
+        release_workspace(path_to_temp_folder)
+        if trace is not None:
+            finish_trace(trace, done)
+        close_channel(channel, done)
+
+
+def transcription_batch(jobs, model=None, opts={}):
+    """F(x) transcribes short simple-mode clips sharing model, language and
+    prompt in one batched pass, through the same transcript cache, trace and
+    progress as transcription_job. jobs: dicts with settings, filename and HPs.
+    Returns (message, done, result) per job, in order.
+    Clips are decoded in memory, so no workspace is needed.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.audio import decode
+    from scripts.cache import evict, read_json, write_json
+    from scripts.progress import close_channel, open_channel
+    from scripts.trace import finish_trace, span, start_trace
+    from scripts.utils import DEFAULT_OPTS, calc_audio_length
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+    settings = jobs[0]["settings"]
+
+    def finished(job, result):
+        return (
+            f"Finished transcribing: {job['filename']}. Find it on the same folder as your audio.",
+            1,
+            result,
+        )
+
+    def write(job, result):
+        # TXT next to each audio, whether the transcript came from cache or not
+        if opts["write_txt"]:
+            path_to_audio = job["settings"]["path_to_audio"]
+            path_to_output_file = os.path.dirname(path_to_audio) + "/" + job["filename"] + ".txt"
+            with span("write_out"):
+                write_result(
+                    path_to_output_file, job["filename"], result, "simple", job["settings"]["timestamps_on"]
+                )
+
+    # CACHED TRANSCRIPTS (same as single jobs)
+    responses = [None] * len(jobs)
+    keys = [
+        transcript_cache_key(job["settings"], job["HPs"], opts) if opts["cache"] else None
+        for job in jobs
+    ]
+    for i, key in enumerate(keys):
+        cached = read_json("transcripts", key) if key is not None else None
+        if cached is not None:
+            write(jobs[i], cached)
+            responses[i] = finished(jobs[i], cached)
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if len(missing) == 0:
+        return responses
+
+    # TRACE AND PROGRESS: the clips left count as one job
+    try:
+        seconds = sum(calc_audio_length(jobs[i]["settings"]["path_to_audio"]) for i in missing)
+    except Exception:
+        seconds = 0.0
+    name = f"batch-{jobs[missing[0]]['filename']}-{len(missing)}"
+    trace = start_trace(name, seconds) if opts["trace"] else None
+    channel = open_channel(name, seconds)
+
+    # TRANSCRIPTION (windows mode: one list of segments per clip)
+    done = 0
+    try:
+        with span("decode", seconds):
+            audios = [decode(jobs[i]["settings"]["path_to_audio"])["samples"] for i in missing]
+        with span("transcription", seconds):
+            results = run_flow(
+                "",
+                settings["path_to_prompt"],
+                settings["family"],
+                settings["model"],
+                settings["language"],
+                settings["gpu_on"],
+                "windows",
+                name,
+                "",
+                model,
+                audios,
+                {**opts, "batch_size": max(len(audios), opts["batch_size"])},
+            )
+
+        # One transcript per clip (empty ones are not cached, they may be failures)
+        for i, segments in zip(missing, results):
+            job, result = jobs[i], {"segments": segments}
+            write(job, result)
+            if keys[i] is not None and complete(result, "simple"):
+                write_json("transcripts", keys[i], result)
+            responses[i] = finished(job, result)
+        done = 1
+    finally:
+        if trace is not None:
+            finish_trace(trace, done)
+        close_channel(channel, done)
+
+    if opts["cache"]:
+        evict()
+    return responses
+
+
+def job_flow(settings, filename, HPs, model, opts, path_to_temp_folder):
+    """F(x) runs a transcription job inside its workspace."""
 
     # FUNCTION IMPORTS
     import shutil
-    from scripts.transcribe_hf import hf_flow
-    from scripts.transcribe_owfw import flow
-    from scripts.utils import create_temp_folder
+    from scripts.assist import read_chunks
+    from scripts.trace import current, span
+    from scripts.workspace import check_quota
 
     # EXTRACT SETTINGS INTO INDEPENDENT VARS
     (
@@ -45,29 +209,107 @@ def transcription_flow(settings, filename, HPs={}):
     ) = list(settings.values())
     path_to_output_file = os.path.dirname(path_to_audio) + "/" + filename + ".txt"
 
+    # CACHED TRANSCRIPT (same audio content and settings; timestamps do not matter)
+    file_key = transcript_cache_key(settings, HPs, opts) if opts["cache"] else None
+    if file_key is not None:
+        from scripts.cache import read_json
+
+        cached = read_json("transcripts", file_key)
+        if cached is not None:
+            print("[LKL|MSG] Found finished transcript in cache.\n")
+            if opts["write_txt"]:
+                with span("write_out"):
+                    write_result(path_to_output_file, filename, cached, approach, timestamps)
+            return (
+                f"Finished transcribing: {filename}. Find it on the same folder as your audio.",
+                1,
+                cached,
+            )
+
+    # DECODE ONCE (in-memory mode): all stages below share views of one buffer
+    # Streamed simple-mode jobs decode block by block instead
+    # Packing short VAD regions into 30s windows needs the decoded audio too
+    # So does sharding a simple-mode audio (which takes precedence over streaming)
+    sharding = opts["shards"] > 1 and approach == "simple"
+    streaming = opts["stream"] and approach == "simple" and not sharding
+    packing = opts["pack"] and approach == "segmentation"
+    one_pass = opts["diarisation_strategy"] == "one_pass" and approach == "diarisation"
+
+    # CHECKPOINTS (loop mode): job folder outside LOKAL_temp, survives crashes
+    path_to_job = ""
+    if opts["resume"] and approach != "simple" and not packing and not one_pass:
+        from scripts.jobs import job_folder
+
+        job_id = file_key or transcript_cache_key(settings, HPs, opts)
+        if job_id is not None:
+            path_to_job = job_folder(job_id)
+
+    # Audio seconds of the whole job (trace records)
+    seconds = current()["audio_s"] if current() is not None else 0.0
+
+    audio = None
+    if (opts["in_memory"] or packing or sharding) and not streaming:
+        from scripts.audio import decode
+
+        # Memory-mapped only if there is a workspace to hold it
+        memmap = opts["memmap"] and path_to_temp_folder != ""
+        path_to_raw = path_to_temp_folder + "/decoded.raw" if memmap else ""
+        with span("decode", seconds):
+            audio = decode(path_to_audio, path_to_raw)
+        if path_to_temp_folder != "":
+            check_quota(path_to_temp_folder)
+
     # OPERATIONS NEEDED FOR SEGMENTATION OR DIARISATION
     if approach != "simple":
 
-        # Folder for temp audios and partial transcriptions
-        path_to_temp_folder = create_temp_folder()
-
         # Transcription mode
         mode = "loop"
 
-        # Segment || diarise as appropriate
-        if approach == "segmentation":
+        # Segment || diarise as appropriate (a resumed job reuses its earlier result)
+        result_file = "temp-segments.txt" if approach == "segmentation" else "temp-diary.txt"
+        resumed = path_to_job != "" and os.path.isfile(f"{path_to_job}/{result_file}")
+        if resumed:
+            print("[LKL|MSG] Resuming earlier job.\n")
+            shutil.copy(f"{path_to_job}/{result_file}", f"{path_to_temp_folder}/{result_file}")
+        elif approach == "segmentation":
             print("[LKL|MSG] Segmenting audio.\n")
-            segmentation(path_to_audio, filename, path_to_temp_folder, HPs)
+            with span("segmentation", seconds):
+                segmentation(
+                    path_to_audio, filename, path_to_temp_folder, HPs, audio, opts["cache"]
+                )
         elif approach == "diarisation":
             print("[LKL|MSG] Diarising audio.\n")
-            diarisation(path_to_audio, filename, path_to_temp_folder, HPs)
+            with span("diarisation", seconds):
+                diarisation(
+                    path_to_audio, filename, path_to_temp_folder, HPs, audio, opts["cache"]
+                )
+        if path_to_job != "" and not resumed:
+            shutil.copy(f"{path_to_temp_folder}/{result_file}", f"{path_to_job}/{result_file}")
 
         # Split audio according to segmentation || diarisation
-        CHUNKS = split_audio(path_to_audio, filename, path_to_temp_folder, approach)
+        # One pass: no split, the whole audio is transcribed once
+        # In-memory: slices of the decoded buffer instead of temp WAVs
+        if one_pass:
+            CHUNKS = read_chunks(path_to_temp_folder, approach)
+            audio_chunks = [audio["samples"]] if audio is not None else None
+        elif audio is not None:
+            from scripts.audio import slice_audio
+
+            CHUNKS = read_chunks(path_to_temp_folder, approach)
+            audio_chunks = slice_audio(audio["samples"], CHUNKS, approach)
+        else:
+            with span("split_audio", seconds):
+                CHUNKS = split_audio(path_to_audio, filename, path_to_temp_folder, approach)
+            audio_chunks = None
+            check_quota(path_to_temp_folder)
+
+        # Segment cache and checkpoints work on the temp WAVs too (kept in chunk order)
+        if (opts["cache"] or path_to_job != "") and audio_chunks is None and not one_pass:
+            audio_chunks = chunk_files(path_to_temp_folder, filename, len(CHUNKS))
 
     else:
-        # Placeholder for temp folder
-        path_to_temp_folder = ""
+        # Whole decoded audio as a single in-memory chunk, if any
+        audio_chunks = [audio["samples"]] if audio is not None else None
 
         # Transcription mode
         mode = "simple"
@@ -75,9 +317,215 @@ def transcription_flow(settings, filename, HPs={}):
     # TRANSCRIPTION
     print("[LKL|MSG] Loading (Internet needed if model NOT already on local memory).")
 
+    # Every dispatch below is one "transcription" stage in the trace
+    with span("transcription", seconds):
+        # Sharding (simple mode): shards cut at quiet points, transcribed concurrently
+        if sharding:
+            segments = sharded_flow(
+                audio,
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                model,
+                opts,
+            )
+        # Streaming (simple mode): transcribe blocks as FFmpeg decodes them
+        elif streaming:
+            segments = stream_flow(
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                model,
+                opts,
+            )
+        # Packing (segmentation): one decoder call per ~30s window, not per region
+        elif packing:
+            segments = packed_flow(
+                audio,
+                CHUNKS,
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                model,
+                opts,
+            )
+        # One pass (diarisation): transcribe once, then words go to speaker turns
+        elif one_pass:
+            segments = one_pass_flow(
+                CHUNKS,
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                path_to_temp_folder,
+                model,
+                audio_chunks,
+                opts,
+            )
+        # Checkpoints (loop mode): segments transcribed by an earlier run are skipped
+        elif path_to_job != "":
+            segments = resumable_loop_flow(
+                path_to_job,
+                CHUNKS,
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                path_to_temp_folder,
+                model,
+                audio_chunks,
+                opts,
+            )
+        # Segment cache (loop mode): only segments not seen before are transcribed
+        elif mode == "loop" and opts["cache"]:
+            segments = cached_loop_flow(
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                path_to_temp_folder,
+                model,
+                audio_chunks,
+                opts,
+            )
+        else:
+            segments = run_flow(
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                mode,
+                filename,
+                path_to_temp_folder,
+                model,
+                audio_chunks,
+                opts,
+            )
+
+    # RESULT: segments (simple) or speaker chunks joined with their content
+    if approach == "simple":
+        result = {"segments": segments}
+    else:
+        print("[LKL|MSG] Joining segments transcriptions")
+        texts = segments if isinstance(segments, list) else None
+        with span("together"):
+            result = {"LINES": together(path_to_temp_folder, CHUNKS, texts, filename)}
+
+    # WRITE TRANSCRIPTION TO FILE
+    if opts["write_txt"]:
+        with span("write_out"):
+            write_result(path_to_output_file, filename, result, approach, timestamps)
+
+    # Keep result for identical re-runs, and drop checkpoints, only if every
+    # chunk came back with text (failed chunks come back empty: a re-run retries them)
+    finished = complete(result, approach)
+    if not finished:
+        print("[LKL|MSG] Some segments came back empty. Not caching this transcript.\n")
+    if file_key is not None and finished:
+        from scripts.cache import evict, stats, write_json
+
+        write_json("transcripts", file_key, result)
+        evict()
+        for kind, counts in stats().items():
+            if kind in ["transcripts", "segments"]:
+                print(
+                    f"[LKL|VERBOSE] Cache ({kind}): {counts['hits']} hits, {counts['misses']} misses ({counts['hit_rate']:.0%})"
+                )
+
+    # Job finished: checkpoints no longer needed
+    if path_to_job != "" and finished:
+        from scripts.jobs import finish_job
+
+        finish_job(path_to_job)
+
+    # Release decoded audio (memory-mapped files cannot be deleted while open)
+    del audio, audio_chunks
+
+    # DECLARE VICTORY
+    return (
+        f"Finished transcribing: {filename}. Find it on the same folder as your audio.",
+        1,
+        result,
+    )
+
+
+# ---------------------
+# FINAL TRANSCRIPT
+# ...
+def write_result(path_to_output_file, filename, result, approach, timestamps):
+    """F(x) writes simple-mode segments or joined loop-mode lines to the TXT file."""
+    print("[LKL|MSG] Writing final transcript.\n")
+    if approach == "simple":
+        with open(path_to_output_file, "w") as f:
+            for segment in result["segments"]:
+                start_timestamp = str(datetime.timedelta(seconds=int(segment["start"])))
+                content = segment["text"]
+                if timestamps is True:
+                    line = f"[{start_timestamp}] {content}"
+                else:
+                    line = f"{content}"
+                try:
+                    f.write(f"{line.strip()}\n")
+                except Exception:
+                    f.write("!------ LINE IS MISSING --------!")
+            f.close()
+    else:
+        write_out(path_to_output_file, filename, result["LINES"], approach, timestamps)
+
+
+# ---------------------
+# TRANSCRIPTION DISPATCH
+# ...
+def run_flow(
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    mode,
+    filename,
+    path_to_temp_folder="",
+    model=None,
+    audio_chunks=None,
+    opts={},
+):
+    """F(x) sends the audio (or in-memory chunks) to the right family's flow."""
+
+    # FUNCTION IMPORTS
+    from scripts.transcribe_hf import hf_flow
+    from scripts.transcribe_owfw import flow
+    from scripts.utils import DEFAULT_OPTS
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
     # Any models using HF pipeline
     if "_hf" in family:
-        segments = hf_flow(
+        return hf_flow(
             path_to_audio,
             family,
             model_size,
@@ -86,10 +534,16 @@ def transcription_flow(settings, filename, HPs={}):
             mode,
             filename,
             path_to_temp_folder,
+            pipe=model,
+            audio_chunks=audio_chunks,
+            batch_size=opts["batch_size"],
+            sort_by_length=opts["sort_by_length"],
+            replicas=opts["replicas"],
+            beam_size=opts["beam_size"],
         )
     # Whisper & Faster Whisper
     else:
-        segments = flow(
+        return flow(
             path_to_audio,
             family,
             model_size,
@@ -99,66 +553,416 @@ def transcription_flow(settings, filename, HPs={}):
             path_to_prompt,
             filename,
             path_to_temp_folder,
+            model=model,
+            audio_chunks=audio_chunks,
+            batch_size=opts["batch_size"],
+            replicas=opts["replicas"],
+            beam_size=opts["beam_size"],
+            compute_type=opts["compute_type"],
         )
 
-    # WRITE TRANSCRIPTION TO FILE
-    if approach == "simple":
-        print("[LKL|MSG] Writing final transcript.\n")
-        with open(path_to_output_file, "w") as f:
-            for segment in segments:
-                start_timestamp = str(datetime.timedelta(seconds=int(segment["start"])))
-                content = segment["text"]
-                if timestamps is True:
-                    line = f"[{start_timestamp}] {content}"
-                else:
-                    line = f"{content}"
-                try:
-                    f.write(f"{line.strip()}\n")
-                except Exception:
-                    f.write("!------ LINE IS MISSING --------!")
-            f.close()
-    else:
-        # Join speaker chunks and transcribed content
-        print("[LKL|MSG] Joining segments transcriptions")
-        LINES = together(path_to_temp_folder, CHUNKS)
 
-        # Write transcript into final TXT file
-        print("[LKL|MSG] Writing final transcript.\n")
-        write_out(path_to_output_file, filename, LINES, approach, timestamps)
+def cached_loop_flow(
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    path_to_temp_folder,
+    model,
+    audio_chunks,
+    opts={},
+):
+    """F(x) transcribes loop-mode chunks (arrays or temp WAVs) through the
+    segment cache: chunks whose audio was transcribed before with the same
+    settings are read back, and only the rest go to the model.
+    Returns one text per chunk, in order.
+    """
 
-    # Remove temp files and directory
-    # Ps1. Folder/files not always created, but deleting always to avoid issues
-    # Ps2. If deletion failure, transcription still be feasible in most cases
-    try:
-        try:
-            shutil.rmtree(path_to_temp_folder)
-        except Exception:
-            os.rmdir(path_to_temp_folder)
-    except Exception:
-        pass
+    # FUNCTION IMPORTS
+    from scripts.cache import array_hash, content_hash, make_key, read_json, write_json
+    from scripts.progress import advance
+    from scripts.trace import seconds_of
 
-    # DECLARE VICTORY
-    return (
-        f"Finished transcribing: {filename}. Find it on the same folder as your audio.",
-        1,
+    # LOOK UP EVERY CHUNK
+    settings_key = model_cache_key(
+        path_to_prompt, family, model_size, language, gpu, decoding_opts(opts)
     )
+    keys = [
+        make_key(content_hash(chunk) if isinstance(chunk, str) else array_hash(chunk), settings_key)
+        for chunk in audio_chunks
+    ]
+    texts = []
+    for key in keys:
+        cached = read_json("segments", key)
+        texts.append(cached["text"] if cached is not None else None)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    print(f"[LKL|VERBOSE] {len(texts) - len(missing)} of {len(texts)} segments found in cache.")
+    advance(sum(seconds_of(chunk) for chunk, text in zip(audio_chunks, texts) if text is not None))
+
+    # TRANSCRIBE THE REST (empty results are not kept, they may be failures)
+    if len(missing) > 0:
+        results = run_flow(
+            path_to_audio,
+            path_to_prompt,
+            family,
+            model_size,
+            language,
+            gpu,
+            "loop",
+            filename,
+            path_to_temp_folder,
+            model,
+            [audio_chunks[i] for i in missing],
+            opts,
+        )
+        for i, text in zip(missing, results):
+            texts[i] = text
+            if text.strip() != "":
+                write_json("segments", keys[i], {"text": text})
+
+    return texts
+
+
+def resumable_loop_flow(
+    path_to_job,
+    CHUNKS,
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    path_to_temp_folder,
+    model,
+    audio_chunks,
+    opts={},
+):
+    """F(x) transcribes loop-mode chunks a few at a time, checkpointing each
+    result in the job folder. Chunks already done by an earlier run of the
+    same job are skipped, so a crash costs at most one group of chunks
+    (one chunk without batching or replicas). Returns one text per chunk.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.jobs import (
+        load_manifest,
+        new_manifest,
+        pending_chunks,
+        read_chunk,
+        save_chunk,
+        save_manifest,
+    )
+    from scripts.progress import advance
+    from scripts.trace import seconds_of
+    from scripts.utils import DEFAULT_OPTS
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
+    # MANIFEST (new one if missing or if chunks changed)
+    manifest = load_manifest(path_to_job)
+    if manifest is None or [entry["chunk"] for entry in manifest["chunks"]] != [
+        list(chunk) for chunk in CHUNKS
+    ]:
+        manifest = new_manifest(path_to_audio, filename, CHUNKS)
+        save_manifest(path_to_job, manifest)
+    pending = pending_chunks(path_to_job, manifest)
+    if len(pending) < len(CHUNKS):
+        print(f"[LKL|MSG] {len(CHUNKS) - len(pending)} of {len(CHUNKS)} segments already transcribed.")
+        advance(sum(seconds_of(audio_chunks[i]) for i in range(len(CHUNKS)) if i not in pending))
+
+    # TRANSCRIBE PENDING CHUNKS, ONE GROUP (batch x replicas) AT A TIME
+    step = max(1, opts["batch_size"]) * max(1, opts["replicas"])
+    for g in range(0, len(pending), step):
+        group = pending[g : g + step]
+        chunks = [audio_chunks[i] for i in group]
+        if opts["cache"]:
+            texts = cached_loop_flow(
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                filename,
+                path_to_temp_folder,
+                model,
+                chunks,
+                opts,
+            )
+        else:
+            texts = run_flow(
+                path_to_audio,
+                path_to_prompt,
+                family,
+                model_size,
+                language,
+                gpu,
+                "loop",
+                filename,
+                path_to_temp_folder,
+                model,
+                chunks,
+                opts,
+            )
+
+        # Checkpoint
+        for i, text in zip(group, texts):
+            save_chunk(path_to_job, manifest, i, text)
+        save_manifest(path_to_job, manifest)
+
+    return [read_chunk(path_to_job, manifest, i) for i in range(len(CHUNKS))]
+
+
+def stream_flow(
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    model=None,
+    opts={},
+):
+    """F(x) transcribes a simple-mode audio block by block while FFmpeg decodes it.
+    Segment starts are shifted by each block's offset, so output matches simple mode.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.audio import stream_audio
+    from scripts.utils import DEFAULT_OPTS
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
+    # TRANSCRIBE EACH BLOCK AS IT ARRIVES
+    segments = []
+    for offset, block in stream_audio(path_to_audio, opts["stream_block_s"]):
+        print(f"[LKL|MSG] Transcribing from {datetime.timedelta(seconds=int(offset))}.")
+        block_segments = run_flow(
+            path_to_audio,
+            path_to_prompt,
+            family,
+            model_size,
+            language,
+            gpu,
+            "simple",
+            filename,
+            model=model,
+            audio_chunks=[block],
+            opts=opts,
+        )
+        for segment in block_segments:
+            start = (segment["start"] or 0) + offset
+            segments.append({"start": start, "text": segment["text"]})
+
+    return segments
+
+
+def sharded_flow(
+    audio,
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    model=None,
+    opts={},
+):
+    """F(x) cuts a simple-mode audio into shards at quiet points near evenly
+    spaced targets, transcribes shards concurrently (one model replica each)
+    and stitches segments back with absolute start times.
+    Shards overlap slightly; words repeated across a cut are dropped.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.align import drop_repeated_words
+    from scripts.audio import shard_points
+    from scripts.utils import DEFAULT_OPTS
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
+    # CUT POINTS (samples), SHARDS WITH A LITTLE OVERLAP ON EACH SIDE
+    sr, samples = audio["sample_rate"], audio["samples"]
+    cuts = shard_points(samples, opts["shards"], sr)
+    overlap = int(opts["shard_overlap_s"] * sr)
+    bounds = [
+        (max(0, cuts[i] - overlap), min(len(samples), cuts[i + 1] + overlap))
+        for i in range(len(cuts) - 1)
+    ]
+    shards = [samples[start:end] for start, end in bounds]
+    print(f"[LKL|MSG] Transcribing {len(shards)} shards concurrently.")
+
+    # TRANSCRIBE SHARDS (timestamped segments per shard, one replica per shard)
+    replicas = opts["replicas"] if opts["replicas"] > 1 else len(shards)
+    shard_segments = run_flow(
+        path_to_audio,
+        path_to_prompt,
+        family,
+        model_size,
+        language,
+        gpu,
+        "windows",
+        filename,
+        model=model,
+        audio_chunks=shards,
+        opts={**opts, "replicas": replicas},
+    )
+
+    # STITCH
+    # Segments starting past a shard's own cut belong to the next shard
+    # The next shard's first words may repeat what this shard ended with
+    segments = []
+    for i, ((start, _), lines) in enumerate(zip(bounds, shard_segments)):
+        first = True
+        for line in lines:
+            line_start = start / sr + (line["start"] or 0)
+            if i < len(shards) - 1 and line_start >= cuts[i + 1] / sr:
+                continue
+            text = line["text"]
+            if first and len(segments) > 0:
+                text = drop_repeated_words(segments[-1]["text"], text)
+            first = False
+            if text.strip() != "":
+                segments.append({"start": line_start, "text": text})
+
+    return segments
+
+
+def packed_flow(
+    audio,
+    CHUNKS,
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    model=None,
+    opts={},
+):
+    """F(x) packs adjacent VAD regions into windows of up to ~30s, transcribes
+    each window once, and hands each timestamped segment back to the region
+    it starts in. Returns one text per region, so write_out works as usual.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.align import assign, join_by_index, pack_regions
+    from scripts.utils import DEFAULT_OPTS
+
+    # PERFORMANCE OPTIONS
+    opts = {**DEFAULT_OPTS, **opts}
+
+    # PACK REGIONS INTO WINDOWS
+    sr = audio["sample_rate"]
+    starts = [max(0.0, chunk[0]) for chunk in CHUNKS]
+    ends = starts[1:] + [audio["duration"]]
+    groups = pack_regions(starts, audio["duration"], opts["pack_window_s"])
+    windows = [
+        audio["samples"][int(starts[first] * sr) : int(ends[last] * sr)]
+        for first, last in groups
+    ]
+    print(f"[LKL|MSG] Packed {len(starts)} speech regions into {len(windows)} windows.")
+
+    # TRANSCRIBE WINDOWS (timestamped segments per window)
+    window_segments = run_flow(
+        path_to_audio,
+        path_to_prompt,
+        family,
+        model_size,
+        language,
+        gpu,
+        "windows",
+        filename,
+        model=model,
+        audio_chunks=windows,
+        opts=opts,
+    )
+
+    # SEND EACH SEGMENT BACK TO THE REGION IT STARTS IN
+    times, texts = [], []
+    for (first, _), segments in zip(groups, window_segments):
+        for segment in segments:
+            times.append(starts[first] + (segment["start"] or 0))
+            texts.append(segment["text"])
+
+    return join_by_index(len(starts), assign(starts, times), texts)
+
+
+def one_pass_flow(
+    CHUNKS,
+    path_to_audio,
+    path_to_prompt,
+    family,
+    model_size,
+    language,
+    gpu,
+    filename,
+    path_to_temp_folder="",
+    model=None,
+    audio_chunks=None,
+    opts={},
+):
+    """F(x) transcribes the whole audio once with word timestamps and gives
+    each word to the speaker turn (from temp-diary.txt) its midpoint falls in.
+    Returns one text per turn, so write_out works as usual.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.align import assign, join_by_index
+
+    # TRANSCRIBE ONCE, WORD BY WORD
+    words = run_flow(
+        path_to_audio,
+        path_to_prompt,
+        family,
+        model_size,
+        language,
+        gpu,
+        "words",
+        filename,
+        path_to_temp_folder,
+        model,
+        audio_chunks,
+        opts,
+    )
+
+    # INTERVAL JOIN: WORD MIDPOINTS AGAINST TURN STARTS
+    starts = [chunk[1] for chunk in CHUNKS]
+    times = [
+        (w["start"] + w["end"]) / 2 if w.get("end") is not None else w["start"] or 0
+        for w in words
+    ]
+    texts = [w["text"] for w in words]
+
+    return join_by_index(len(starts), assign(starts, times), texts)
 
 
 # ---------------------
 # SEGMENTATION FUNCTION
 # ...
-def segmentation(path_to_audio, filename, path_to_temp_folder, HPs):
-    """F(x) calls Pyannote and writes result to temporary TXT file."""
+def segmentation(
+    path_to_audio, filename, path_to_temp_folder, HPs, audio=None, use_cache=True
+):
+    """F(x) calls Pyannote and writes result to temporary TXT file.
+    Reads the shared decoded audio if given, else decodes the file itself.
+    Frame-level speech scores are cached on disk per audio and model, so
+    re-runs with other hyper-parameters only need to re-binarize them.
+    """
 
     # Function imports
-    from pyannote.audio import Model
-    from pyannote.audio.pipelines import VoiceActivityDetection
     from pyannote.audio.pipelines.utils.hook import ProgressHook
-
-    # Load segmentation model
-    model_location = "models/segmentation/pytorch_model.bin"
-    model = Model.from_pretrained(resource_path(model_location))
-    pipeline = VoiceActivityDetection(segmentation=model)
+    from pyannote.audio.utils.signal import Binarize
+    from scripts.registry import exclusive, fetch
 
     # Define hyper-parameters for model
     PARAMS = {
@@ -166,10 +970,33 @@ def segmentation(path_to_audio, filename, path_to_temp_folder, HPs):
         "min_duration_off": HPs["min_duration_off"],
     }  # fill non-speech regions
 
-    # Run model
-    pipeline.instantiate(PARAMS)
-    with ProgressHook() as hook:
-        segments = pipeline(path_to_audio, hook=hook)
+    # Cached speech scores, if this audio went through this model before
+    key = vad_cache_key(path_to_audio) if use_cache else None
+    scores = load_features("vad", key) if key is not None else None
+
+    # Cache hit: binarize scores (same thresholds the pipeline uses)
+    if scores is not None:
+        print("[LKL|VERBOSE] Reusing cached speech scores")
+        binarize = Binarize(onset=0.5, offset=0.5, **PARAMS)
+        segments = binarize(scores)
+
+    # Cache miss: run model, keeping the scores it computes on the way
+    # The shared pipeline is configured per job, so jobs take turns on it
+    else:
+        key_model = ("pyannote", "segmentation", "cpu", None)
+        pipeline = fetch(key_model, load_vad_pipeline)
+        captured = {}
+        with exclusive(key_model), ProgressHook() as progress:
+            pipeline.instantiate(PARAMS)
+
+            def hook(step_name, step_artefact, file=None, total=None, completed=None):
+                if step_name == "segmentation":
+                    captured["scores"] = step_artefact
+                progress(step_name, step_artefact, file=file, total=total, completed=completed)
+
+            segments = pipeline(pyannote_input(path_to_audio, audio), hook=hook)
+        if key is not None and "scores" in captured:
+            save_features("vad", key, captured["scores"])
 
     # Save segments to temp TXT file
     L = []
@@ -189,22 +1016,24 @@ def segmentation(path_to_audio, filename, path_to_temp_folder, HPs):
 # ---------------------
 # DIARISATION FUNCTION
 # ...
-def diarisation(path_to_audio, filename, path_to_temp_folder, HPs):
+def diarisation(
+    path_to_audio, filename, path_to_temp_folder, HPs, audio=None, use_cache=True
+):
     """F(x) performs diarisation using pyannote.
     It writes result to temporary TXT file.
+    Reads the shared decoded audio if given, else decodes the file itself.
+    Segmentation outputs and speaker embeddings are cached on disk per audio
+    and models, so re-runs with other settings only redo clustering.
     """
 
     # Import necessary libraries
-    from pyannote.audio import Model
-    from pyannote.audio.pipelines import SpeakerDiarization as Pipeline
+    from contextlib import nullcontext
     from pyannote.audio.pipelines.utils.hook import ProgressHook
+    from scripts.registry import exclusive, fetch
 
-    # Initialise models
-    seg_model_loc = "models/segmentation/pytorch_model.bin"
-    emb_model_loc = "models/embedding/pytorch_model.bin"
-    segmentation_model = Model.from_pretrained(resource_path(seg_model_loc))
-    embedding_model = Model.from_pretrained(resource_path(emb_model_loc))
-    pipeline = Pipeline(segmentation=segmentation_model, embedding=embedding_model)
+    # Initialise models (kept warm between runs)
+    key_model = ("pyannote", "diarisation", "cpu", None)
+    pipeline = fetch(key_model, load_diarisation_pipeline)
 
     # Set hyper-parameters
     PARAMS = {
@@ -218,16 +1047,21 @@ def diarisation(path_to_audio, filename, path_to_temp_folder, HPs):
         },
     }
 
-    # Run model
-    pipeline.instantiate(PARAMS)
-    if HPs["speaker_num"] == "AUTO":
-        with ProgressHook() as hook:
-            diarization = pipeline(path_to_audio, hook=hook)
-    else:
-        with ProgressHook() as hook:
-            diarization = pipeline(
-                path_to_audio, speaker_num=int(HPs["speaker_num"]), hook=hook
-            )
+    # Run model (reading/filling the cache of segmentations and embeddings)
+    # The shared pipeline is configured and patched per job, so jobs take turns on it
+    source = pyannote_input(path_to_audio, audio)
+    key = diarisation_cache_key(path_to_audio) if use_cache else None
+    steps = cached_steps(pipeline, key) if key is not None else nullcontext()
+    with exclusive(key_model), steps:
+        pipeline.instantiate(PARAMS)
+        if HPs["speaker_num"] == "AUTO":
+            with ProgressHook() as hook:
+                diarization = pipeline(source, hook=hook)
+        else:
+            with ProgressHook() as hook:
+                diarization = pipeline(
+                    source, num_speakers=int(HPs["speaker_num"]), hook=hook
+                )
 
     with open(path_to_temp_folder + "/" + "temp-diary.txt", "a") as f:
         for turn, _, speaker in diarization.itertracks(yield_label=True):
@@ -237,6 +1071,214 @@ def diarisation(path_to_audio, filename, path_to_temp_folder, HPs):
     return f"[LKL|MSG] Finished segmentation of {filename}"
 
 
+# ---------------------
+# PYANNOTE LOADERS & INPUTS
+# ...
+def pyannote_input(path_to_audio, audio=None):
+    """F(x) gives pyannote a view of the decoded audio or, failing that, the file."""
+    if audio is None:
+        return path_to_audio
+
+    from scripts.audio import as_pyannote
+
+    return as_pyannote(audio)
+
+
+def load_vad_pipeline():
+    """F(x) builds the voice activity detection pipeline from local models."""
+    from pyannote.audio import Model
+    from pyannote.audio.pipelines import VoiceActivityDetection
+
+    model_location = "models/segmentation/pytorch_model.bin"
+    model = Model.from_pretrained(resource_path(model_location))
+    return VoiceActivityDetection(segmentation=model)
+
+
+def load_diarisation_pipeline():
+    """F(x) builds the speaker diarisation pipeline from local models."""
+    from pyannote.audio import Model
+    from pyannote.audio.pipelines import SpeakerDiarization as Pipeline
+
+    seg_model_loc = "models/segmentation/pytorch_model.bin"
+    emb_model_loc = "models/embedding/pytorch_model.bin"
+    segmentation_model = Model.from_pretrained(resource_path(seg_model_loc))
+    embedding_model = Model.from_pretrained(resource_path(emb_model_loc))
+    return Pipeline(segmentation=segmentation_model, embedding=embedding_model)
+
+
+# ---------------------
+# CACHED TRANSCRIPTS
+# ...
+def model_cache_key(path_to_prompt, family, model_size, language, gpu, decoding={}):
+    """F(x) folds everything a transcription depends on, besides the audio"""
+    from scripts.cache import make_key
+
+    prompt = ""
+    if path_to_prompt != "":
+        with open(path_to_prompt, "r") as f:
+            prompt = f.read()
+    if len(decoding) > 0:
+        return make_key(family, model_size, language, gpu, prompt, decoding)
+    return make_key(family, model_size, language, gpu, prompt)
+
+
+def decoding_opts(opts):
+    """F(x) returns decoding options changed from their defaults (beams,
+    compute type), which change the text and so belong in cache keys
+    """
+    from scripts.utils import DEFAULT_OPTS
+
+    return {
+        k: opts[k]
+        for k in ["beam_size", "compute_type"]
+        if opts.get(k, DEFAULT_OPTS[k]) != DEFAULT_OPTS[k]
+    }
+
+
+def complete(result, approach):
+    """F(x) tells whether a transcript has text for every chunk (simple mode:
+    any segment at all); failed or empty chunks make it incomplete
+    """
+    if approach == "simple":
+        return len(result["segments"]) > 0
+    return len(result["LINES"]) > 0 and all(
+        str(line[2]).strip() != "" for line in result["LINES"]
+    )
+
+
+def transcript_cache_key(settings, HPs, opts):
+    """F(x) keys a finished transcript by audio content, model settings,
+    approach, hyper-parameters and the options that change the text.
+    Timestamps only change how the transcript is written, so they are left out.
+    """
+    from scripts.cache import content_hash, make_key
+
+    try:
+        OUTPUT_OPTS = ["pack", "pack_window_s", "diarisation_strategy", "shards"]
+        return make_key(
+            "transcript",
+            content_hash(settings["path_to_audio"]),
+            model_cache_key(
+                settings["path_to_prompt"],
+                settings["family"],
+                settings["model"],
+                settings["language"],
+                settings["gpu_on"],
+                decoding_opts(opts),
+            ),
+            settings["approach"],
+            HPs,
+            {k: opts[k] for k in OUTPUT_OPTS},
+        )
+    except Exception:
+        return None
+
+
+# ---------------------
+# CACHED SPEECH SCORES
+# ...
+def vad_cache_key(path_to_audio):
+    """F(x) keys speech scores by audio content and segmentation model"""
+    from scripts.cache import content_hash, make_key
+
+    try:
+        model_hash = content_hash(resource_path("models/segmentation/pytorch_model.bin"))
+        return make_key("vad", content_hash(path_to_audio), model_hash)
+    except Exception:
+        return None
+
+
+def load_features(kind, key, mmap=False):
+    """F(x) rebuilds a cached pyannote SlidingWindowFeature (None if missing)"""
+    from pyannote.core import SlidingWindow, SlidingWindowFeature
+    from scripts.cache import load_array
+
+    data, meta = load_array(kind, key, mmap)
+    if data is None:
+        return None
+    frames = SlidingWindow(start=meta["start"], duration=meta["duration"], step=meta["step"])
+    return SlidingWindowFeature(data, frames)
+
+
+def save_features(kind, key, features):
+    """F(x) stores a pyannote SlidingWindowFeature (array plus its frame timing)"""
+    from scripts.cache import save_array
+
+    frames = features.sliding_window
+    meta = {"start": frames.start, "duration": frames.duration, "step": frames.step}
+    try:
+        save_array(kind, key, features.data, meta)
+    except Exception as e:
+        print(f"[LKL|VERBOSE] Could not cache {kind}: {e}")
+
+
+# ---------------------
+# CACHED DIARISATION STEPS
+# ...
+def diarisation_cache_key(path_to_audio):
+    """F(x) keys segmentation outputs and embeddings by audio content and both models"""
+    from scripts.cache import content_hash, make_key
+
+    try:
+        seg_hash = content_hash(resource_path("models/segmentation/pytorch_model.bin"))
+        emb_hash = content_hash(resource_path("models/embedding/pytorch_model.bin"))
+        return make_key("diarisation", content_hash(path_to_audio), seg_hash, emb_hash)
+    except Exception:
+        return None
+
+
+def cached_steps(pipeline, key):
+    """F(x) returns a context in which the diarisation pipeline reads its
+    segmentation outputs and speaker embeddings from the cache (memory-mapped)
+    or stores them after computing them. Neither depends on speaker number,
+    clustering or min_duration_off, so only clustering runs on a hit.
+    Callers hold the pipeline's exclusive() lock around it.
+    """
+    from contextlib import contextmanager
+
+    @contextmanager
+    def wrap():
+        from scripts.cache import load_array, make_key, save_array
+
+        get_segmentations = pipeline.get_segmentations
+        get_embeddings = pipeline.get_embeddings
+
+        def cached_segmentations(file, hook=None):
+            segmentations = load_features("diarisation-segmentations", key, mmap=True)
+            if segmentations is not None:
+                print("[LKL|VERBOSE] Reusing cached segmentation outputs")
+                return segmentations
+            segmentations = get_segmentations(file, hook=hook)
+            save_features("diarisation-segmentations", key, segmentations)
+            return segmentations
+
+        def cached_embeddings(file, binarized_segmentations, exclude_overlap=False, hook=None):
+            emb_key = make_key(key, exclude_overlap)
+            embeddings, _ = load_array("diarisation-embeddings", emb_key, mmap=True)
+            if embeddings is not None:
+                print("[LKL|VERBOSE] Reusing cached speaker embeddings")
+                return embeddings
+            embeddings = get_embeddings(
+                file, binarized_segmentations, exclude_overlap=exclude_overlap, hook=hook
+            )
+            try:
+                save_array("diarisation-embeddings", emb_key, embeddings)
+            except Exception as e:
+                print(f"[LKL|VERBOSE] Could not cache speaker embeddings: {e}")
+            return embeddings
+
+        # Instance attributes shadow the methods for this run only
+        pipeline.get_segmentations = cached_segmentations
+        pipeline.get_embeddings = cached_embeddings
+        try:
+            yield pipeline
+        finally:
+            del pipeline.get_segmentations
+            del pipeline.get_embeddings
+
+    return wrap()
+
+
 # ---------------------
 # NAME:MAIN?
 # ...
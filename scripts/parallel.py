@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Parallel transcription of many segments across model replicas.
+Each replica runs in its own thread and pulls segments from a shared
+queue. Whisper libraries release the GIL while computing, so threads
+are enough to keep all cores busy.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import queue
+import threading
+
+
+# ---------------------
+# EXECUTOR
+# ...
+def run_parallel(items, work, load_replica, replicas):
+    """F(x) runs work(model, item) for every item across N replicas.
+    load_replica(r) returns the model for replica r (called in its thread).
+    Results come back in item order; failed items give None.
+    Replica threads record into the caller's trace and progress, if any.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts import progress
+    from scripts.trace import adopt, current, leave
+
+    # SHARED QUEUE
+    jobs = queue.Queue()
+    for i, item in enumerate(items):
+        jobs.put((i, item))
+    results = [None] * len(items)
+    trace, channel = current(), progress.current()
+
+    # ONE THREAD PER REPLICA
+    def worker(r):
+        adopt(trace)
+        progress.adopt(channel)
+        try:
+            model = load_replica(r)
+        except Exception as e:
+            print(f"[LKL|MSG] Replica {r + 1} failed to load: {e}")
+            leave()
+            progress.leave()
+            return
+        while True:
+            try:
+                i, item = jobs.get_nowait()
+            except queue.Empty:
+                leave()
+                progress.leave()
+                return
+            try:
+                results[i] = work(model, item)
+            except Exception as e:
+                print(f"[LKL|MSG] Error transcribing: {e}")
+
+    threads = [
+        threading.Thread(target=worker, args=(r,), daemon=True)
+        for r in range(min(replicas, len(items)))
+    ]
+    with torch_threads(threads_per_replica(len(threads))):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return results
+
+
+# ---------------------
+# THREAD BUDGET
+# ...
+def threads_per_replica(replicas):
+    """F(x) splits the machine's cores evenly between replicas"""
+    return max(1, (os.cpu_count() or 1) // max(1, replicas))
+
+
+def torch_threads(n):
+    """F(x) returns a context that caps torch's intra-op threads to n and
+    restores the previous value on exit. The setting is process-wide: every
+    replica thread (and anything else running torch meanwhile) gets n.
+    """
+    from contextlib import contextmanager
+
+    @contextmanager
+    def cap():
+        try:
+            import torch
+        except ImportError:
+            yield
+            return
+        previous = torch.get_num_threads()
+        torch.set_num_threads(n)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+    return cap()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+In-process progress of transcription jobs, in audio seconds processed.
+Flows report audio as they get through it (advance / follow); whoever
+wants to show progress (e.g. the GUI) subscribes and gets events on a
+queue of its own. No files, no log scraping.
+
+Notes:
+  - Each job has a channel tied to the thread running it (helper threads,
+    like replicas, adopt their job's channel), so concurrent jobs do not mix.
+  - Whisper and HF pipelines decode whole audios in one call. Within such a
+    call, progress moves one decoder window at a time (see counting), so it
+    is an estimate until the call returns.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+# Channel of the job each thread works for: thread id -> channel
+ACTIVE = {}
+
+# Event queues of everyone following progress
+LISTENERS = []
+LISTENERS_LOCK = threading.Lock()
+
+
+# ---------------------
+# CHANNEL LIFECYCLE
+# ...
+def open_channel(job, total_seconds=0.0, path=""):
+    """F(x) opens the progress channel of a job and ties it to the calling thread.
+    path (the job's audio) tells apart jobs with the same name.
+    """
+    channel = {
+        "job": job,
+        "path": path,
+        "total_s": total_seconds,
+        "done_s": 0.0,
+        "started": time.time(),
+        "lock": threading.Lock(),
+    }
+    adopt(channel)
+    publish(channel, "start")
+    return channel
+
+
+def current():
+    """F(x) returns the channel of the calling thread's job (None if none)"""
+    return ACTIVE.get(threading.get_ident())
+
+
+def adopt(channel):
+    """F(x) makes helper threads (e.g. replicas) report into a job's channel"""
+    if channel is not None:
+        ACTIVE[threading.get_ident()] = channel
+
+
+def leave():
+    """F(x) unties the calling thread from its channel"""
+    ACTIVE.pop(threading.get_ident(), None)
+
+
+def close_channel(channel, done=1):
+    """F(x) ends a job's progress (100% if it succeeded) and unties the thread"""
+    leave()
+    if done == 1:
+        with channel["lock"]:
+            channel["done_s"] = channel["total_s"]
+    publish(channel, "end", done=done)
+
+
+# ---------------------
+# REPORTING
+# ...
+def advance(seconds):
+    """F(x) adds processed audio seconds to the calling thread's job (never past its total)"""
+    channel = current()
+    if channel is None or seconds <= 0:
+        return
+    with channel["lock"]:
+        channel["done_s"] = min(channel["total_s"], channel["done_s"] + seconds)
+    publish(channel, "progress")
+
+
+def follow(chunk):
+    """F(x) returns reach(t), which reports an audio (path, array or length in
+    seconds) as processed up to t seconds. Calls must move forward; reach()
+    with no argument reports the rest of it. No-op if the thread has no channel.
+    """
+    if current() is None:
+        return lambda t=None: None
+
+    from scripts.trace import seconds_of
+
+    seconds = chunk if isinstance(chunk, (int, float)) else seconds_of(chunk)
+    reported = [0.0]
+
+    def reach(t=None):
+        t = seconds if t is None else min(max(t, 0.0), seconds)
+        if t > reported[0]:
+            advance(t - reported[0])
+            reported[0] = t
+
+    return reach
+
+
+@contextmanager
+def counting(obj, method, seconds_per_call, reach):
+    """F(x) shadows obj.method (on the instance) while a whole-audio call runs,
+    so each call to it moves progress on by seconds_per_call(*args, **kwargs).
+    Used on decoder calls, one per window. Left alone if already shadowed;
+    calls from other threads sharing the object do not count.
+    """
+    if current() is None or not hasattr(obj, "__dict__") or method in vars(obj):
+        yield
+        return
+    original = getattr(obj, method)
+    position = [0.0]
+    owner = threading.get_ident()
+
+    def shadow(*args, **kwargs):
+        result = original(*args, **kwargs)
+        if threading.get_ident() == owner:
+            position[0] += seconds_per_call(*args, **kwargs)
+            reach(position[0])
+        return result
+
+    setattr(obj, method, shadow)
+    try:
+        yield
+    finally:
+        delattr(obj, method)
+
+
+def rows(*args, **kwargs):
+    """F(x) returns the batch size of a decoder call (first array-like argument)"""
+    for value in list(args) + list(kwargs.values()):
+        shape = getattr(value, "shape", None)
+        if shape is not None and len(shape) > 0:
+            return int(shape[0])
+    return 1
+
+
+# ---------------------
+# FOLLOWING
+# ...
+def subscribe():
+    """F(x) returns a queue that receives every job's progress events"""
+    events = queue.Queue()
+    with LISTENERS_LOCK:
+        LISTENERS.append(events)
+    return events
+
+
+def unsubscribe(events):
+    """F(x) stops sending events to a queue"""
+    with LISTENERS_LOCK:
+        if events in LISTENERS:
+            LISTENERS.remove(events)
+
+
+def snapshot(channel):
+    """F(x) returns a job's progress: fraction, audio seconds, elapsed and ETA"""
+    with channel["lock"]:
+        done_s, total_s = channel["done_s"], channel["total_s"]
+    elapsed = time.time() - channel["started"]
+    fraction = done_s / total_s if total_s > 0 else 0.0
+    return {
+        "job": channel["job"],
+        "path": channel["path"],
+        "done_s": done_s,
+        "total_s": total_s,
+        "fraction": fraction,
+        "elapsed_s": elapsed,
+        "eta_s": elapsed * (1 - fraction) / fraction if fraction > 0 else None,
+    }
+
+
+def publish(channel, kind, **fields):
+    """F(x) sends an event to every listener (cheap if nobody listens)"""
+    with LISTENERS_LOCK:
+        listeners = list(LISTENERS)
+    if len(listeners) == 0:
+        return
+    event = {"kind": kind, **snapshot(channel), **fields}
+    for events in listeners:
+        events.put(event)
+
+
+# ---------------------
+# NAME:MAIN?
+# ...
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+In-process registry that keeps loaded models warm between jobs.
+Entries are keyed by (family, size, device, compute type) and evicted
+least-recently-used first once the RAM budget is exceeded.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Warm models, least recently used first: key -> {"model": ..., "mb": ...}
+REGISTRY = OrderedDict()
+
+# RAM budget (MB) for all warm models. Override with LOKAL_MODEL_RAM_MB.
+BUDGET = {"mb": float(os.environ.get("LOKAL_MODEL_RAM_MB", 8192))}
+
+# Running statistics
+STATS = {"hits": 0, "misses": 0, "evictions": 0, "load_seconds": 0.0}
+
+# Rough RAM footprint (MB, float32) used when a model cannot be measured
+APPROX_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 1000,
+    "medium": 3000,
+    "large": 6000,
+    "segmentation": 50,
+    "diarisation": 150,
+}
+
+LOCK = threading.RLock()
+
+# One lock per key being (or once) loaded, so loads of a key happen once: key -> lock
+LOADING = {}
+
+# Locks held by jobs while they use a shared model they configure in place
+# (e.g. pyannote pipelines, which are instantiated with each job's HPs): key -> lock
+IN_USE = {}
+
+
+# ---------------------
+# REGISTRY FUNCTIONS
+# ...
+def fetch(key, loader):
+    """F(x) returns the warm model for key, calling loader() on a miss.
+    Key is a tuple (family, size, device, compute_type), optionally followed
+    by a replica tag when several copies of a model are kept.
+    Only fetches of the same key wait for a load; the registry lock is held
+    just around dictionary access, so hits and stats() never wait on one.
+    """
+
+    # HIT
+    with LOCK:
+        if key in REGISTRY:
+            return hit(key)
+        loading = LOADING.setdefault(key, threading.Lock())
+
+    # MISS: one load per key at a time (a waiting caller then finds it warm)
+    with loading:
+        with LOCK:
+            if key in REGISTRY:
+                return hit(key)
+            STATS["misses"] += 1
+
+        from scripts.trace import span
+
+        start_time = time.time()
+        with span("model_load", model=describe(key)):
+            model = loader()
+        load_seconds = time.time() - start_time
+        mb = footprint_mb(model, key)
+        print(f"[LKL|VERBOSE] Loaded model {describe(key)} in {load_seconds:.1f}s")
+
+        # STORE & EVICT
+        with LOCK:
+            STATS["load_seconds"] += load_seconds
+            REGISTRY[key] = {"model": model, "mb": mb}
+            evict()
+        return model
+
+
+def hit(key):
+    """F(x) returns a warm model and marks it most recently used (hold LOCK)"""
+    REGISTRY.move_to_end(key)
+    STATS["hits"] += 1
+    print(f"[LKL|VERBOSE] Reusing warm model: {describe(key)}")
+    return REGISTRY[key]["model"]
+
+
+def exclusive(key):
+    """F(x) returns the lock to hold while a job configures and runs a shared
+    model, so concurrent jobs (e.g. service workers) take turns on it
+    """
+    with LOCK:
+        return IN_USE.setdefault(key, threading.Lock())
+
+
+def evict():
+    """F(x) drops least recently used models until the RAM budget is met.
+    The most recent model always stays, even if it alone exceeds the budget.
+    """
+    with LOCK:
+        while len(REGISTRY) > 1 and total_mb() > BUDGET["mb"]:
+            key, _ = REGISTRY.popitem(last=False)
+            STATS["evictions"] += 1
+            print(f"[LKL|VERBOSE] Evicted model: {describe(key)}")
+
+
+def set_budget(mb):
+    """F(x) changes the RAM budget (MB) and evicts as needed"""
+    BUDGET["mb"] = float(mb)
+    evict()
+
+
+def clear():
+    """F(x) empties the registry (e.g. after models are reset from disk)"""
+    with LOCK:
+        REGISTRY.clear()
+
+
+def stats():
+    """F(x) returns hit/miss/load-time statistics plus current occupancy"""
+    with LOCK:
+        lookups = STATS["hits"] + STATS["misses"]
+        return {
+            **STATS,
+            "hit_rate": STATS["hits"] / lookups if lookups > 0 else 0.0,
+            "warm_models": [describe(key) for key in REGISTRY],
+            "warm_mb": total_mb(),
+            "budget_mb": BUDGET["mb"],
+        }
+
+
+# ---------------------
+# ASSISTIVE FUNCTIONS
+# ...
+def total_mb():
+    return sum(entry["mb"] for entry in REGISTRY.values())
+
+
+def describe(key):
+    return "/".join(str(k) for k in key if k is not None)
+
+
+def footprint_mb(model, key):
+    """F(x) measures parameters of torch models; falls back to rough sizes"""
+
+    # Whisper is an nn.Module, HF pipelines expose .model
+    module = getattr(model, "model", model)
+    try:
+        size = sum(p.numel() * p.element_size() for p in module.parameters())
+        if size > 0:
+            return size / 1024**2
+    except Exception:
+        pass
+
+    # Faster Whisper, pyannote pipelines and anything else
+    family, model_size, _, compute_type = key[:4]
+    mb = APPROX_MB.get(model_size, 500)
+    if compute_type == "int8":
+        mb = mb / 4
+    elif compute_type == "float16":
+        mb = mb / 2
+    return mb
@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Local HTTP service, so other tools can transcribe with LOKAL.
+Usage (from the root of the repository):
+    python -m scripts.service --accept-terms [options]
+
+Endpoints (JSON in, JSON out):
+  - GET  /health      status, queue length and warm models,
+  - POST /transcribe  either a JSON body {"path": "...", ...settings} or the
+                      raw audio bytes, with settings in the query string:
+                      /transcribe?filename=call.mp3&approach=diarisation
+Settings not given fall back to the ones the service started with.
+Requests wait in a bounded queue; a fixed number of workers take them one
+at a time. Models stay loaded between requests (see scripts.registry).
+Short simple-mode clips arriving together for the same model and language
+are batched when the family decodes clips together (HF pipelines, Faster
+Whisper's batched pipeline): a worker waits a few milliseconds for matching
+requests and transcribes them all in one batched pass, then answers each caller.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import time
+import threading
+
+# State of the running service: defaults, request queue and counters
+SERVICE = {
+    "settings": {},
+    "HPs": {},
+    "opts": {},
+    "threads": 0,
+    "workers": 1,
+    "max_upload_mb": 512,
+    "queue_size": 8,
+    "batch_max": 8,
+    "batch_wait_s": 0.05,
+    "batch_max_s": 60.0,
+    "pending": [],
+    "cond": threading.Condition(),
+    "served": 0,
+    "failed": 0,
+    "batches": 0,
+}
+
+
+# ---------------------
+# SERVICE FLOW
+# ...
+def serve(
+    settings,
+    HPs={},
+    host="127.0.0.1",
+    port=8765,
+    workers=1,
+    queue_size=8,
+    threads=0,
+    max_upload_mb=512,
+    batch_max=8,
+    batch_wait_ms=50,
+    batch_max_s=60.0,
+    opts={},
+):
+    """F(x) starts the workers, then answers HTTP requests until stopped.
+    Each worker keeps a warm copy of the default model, so requests run
+    concurrently without reloading anything. Up to batch_max short clips
+    (batch_max_s seconds at most) waiting batch_wait_ms go in one batch.
+    """
+
+    # FUNCTION IMPORTS
+    from http.server import ThreadingHTTPServer
+    from scripts.parallel import threads_per_replica
+
+    # STATE
+    threads = threads if threads > 0 else threads_per_replica(workers)
+    SERVICE.update(
+        {
+            "settings": settings,
+            "HPs": HPs,
+            "opts": {**opts, "write_txt": False},
+            "threads": threads,
+            "workers": workers,
+            "max_upload_mb": max_upload_mb,
+            "queue_size": queue_size,
+            "batch_max": batch_max,
+            "batch_wait_s": batch_wait_ms / 1000,
+            "batch_max_s": batch_max_s,
+        }
+    )
+
+    # WORKERS (each loads its model copy before taking requests)
+    for replica in range(workers):
+        threading.Thread(target=worker_loop, args=(replica,), daemon=True).start()
+
+    # SERVER
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    print(f"[LKL|MSG] LOKAL service listening on http://{host}:{port} ({workers} worker(s)).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[LKL|MSG] Stopping LOKAL service.")
+    finally:
+        server.server_close()
+
+
+def worker_loop(replica):
+    """F(x) takes queued requests one at a time, forever."""
+    from scripts.batch import warm_model
+
+    try:
+        warm_model(
+            SERVICE["settings"], SERVICE["threads"], replica, SERVICE["opts"].get("compute_type", "")
+        )
+    except Exception as e:
+        print(f"[LKL|MSG] Worker {replica} could not load its model: {e}")
+
+    while True:
+        jobs = next_batch()
+
+        # Many clips: one batched pass (each clip on its own if that fails)
+        if len(jobs) > 1:
+            try:
+                run_batch(jobs, replica)
+                with SERVICE["cond"]:
+                    SERVICE["batches"] += 1
+            except Exception as e:
+                print(f"[LKL|MSG] Batch of {len(jobs)} failed ({e}). Running one by one.")
+
+        for job in jobs:
+            if job["response"] is None:
+                try:
+                    job["response"] = run_request(job, replica)
+                except Exception as e:
+                    job["response"] = (500, {"error": f"Transcription failed: {e}"})
+            with SERVICE["cond"]:
+                SERVICE["served" if job["response"][0] == 200 else "failed"] += 1
+            job["event"].set()
+
+
+def next_batch():
+    """F(x) waits for the oldest request and returns it, plus any requests
+    for the same model and language that arrive within the batching window.
+    """
+    cond, pending = SERVICE["cond"], SERVICE["pending"]
+    with cond:
+        while len(pending) == 0:
+            cond.wait()
+        jobs = [pending.pop(0)]
+        if jobs[0]["key"] is None or SERVICE["batch_max"] <= 1:
+            return jobs
+
+        # Collect matching requests until the batch is full or the window closes
+        deadline = time.time() + SERVICE["batch_wait_s"]
+        while True:
+            for job in [job for job in pending if job["key"] == jobs[0]["key"]]:
+                if len(jobs) < SERVICE["batch_max"]:
+                    pending.remove(job)
+                    jobs.append(job)
+            remaining = deadline - time.time()
+            if len(jobs) >= SERVICE["batch_max"] or remaining <= 0:
+                return jobs
+            cond.wait(remaining)
+
+
+def run_request(job, replica):
+    """F(x) transcribes one request with the worker's warm model.
+    Returns (HTTP status, JSON-friendly body).
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.batch import audio_opts, warm_model
+    from scripts.lokal_transcribe import transcription_job
+
+    # KEY SETTINGS
+    start_time = time.time()
+    settings, HPs, filename = job["settings"], job["HPs"], job["filename"]
+    opts = audio_opts(settings["path_to_audio"], SERVICE["opts"])
+
+    # TRANSCRIPTION
+    model = warm_model(
+        settings, SERVICE["threads"], replica, SERVICE["opts"].get("compute_type", "")
+    )
+    message, done, result = transcription_job(settings, filename, HPs, model, opts)
+    if done != 1:
+        return 500, {"error": message}
+
+    return 200, {
+        "filename": filename,
+        "approach": settings["approach"],
+        "segments": to_segments(result, settings["approach"]),
+        "seconds": time.time() - start_time,
+    }
+
+
+def run_batch(jobs, replica):
+    """F(x) transcribes several short clips in one batched pass (HF pipelines
+    get them as a list, Faster Whisper as clips of one array) and hands each
+    request its own segments. Clips share model, language and prompt.
+    Cache, trace and progress work as for single requests (transcription_batch).
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.batch import warm_model
+    from scripts.lokal_transcribe import transcription_batch
+
+    # KEY SETTINGS
+    start_time = time.time()
+    settings = jobs[0]["settings"]
+    print(f"[LKL|VERBOSE] Batching {len(jobs)} requests.")
+
+    # TRANSCRIPTION
+    model = warm_model(
+        settings, SERVICE["threads"], replica, SERVICE["opts"].get("compute_type", "")
+    )
+    responses = transcription_batch(jobs, model, SERVICE["opts"])
+
+    # FAN OUT
+    seconds = time.time() - start_time
+    for job, (message, done, result) in zip(jobs, responses):
+        job["response"] = (
+            200,
+            {
+                "filename": job["filename"],
+                "approach": "simple",
+                "segments": to_segments(result, "simple"),
+                "seconds": seconds,
+                "batched": len(jobs),
+            },
+        )
+
+
+# ---------------------
+# HTTP HANDLER
+# ...
+# http.server needs a handler class: this one only parses requests and
+# hands them to the functions above.
+from http.server import BaseHTTPRequestHandler
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/health":
+            return self.reply(404, {"error": "Unknown endpoint."})
+        from scripts.registry import stats
+
+        self.reply(
+            200,
+            {
+                "status": "ok",
+                "workers": SERVICE["workers"],
+                "queued": len(SERVICE["pending"]),
+                "served": SERVICE["served"],
+                "failed": SERVICE["failed"],
+                "batches": SERVICE["batches"],
+                "warm_models": stats()["warm_models"],
+            },
+        )
+
+    def do_POST(self):
+        from urllib.parse import parse_qsl, urlsplit
+        from scripts.workspace import create_workspace, release_workspace
+
+        url = urlsplit(self.path)
+        if url.path != "/transcribe":
+            return self.reply(404, {"error": "Unknown endpoint."})
+
+        # BODY: JSON with a path, or the audio itself
+        size = int(self.headers.get("Content-Length", 0))
+        if size > SERVICE["max_upload_mb"] * 1024**2:
+            return self.reply(413, {"error": "Upload too large."})
+        body = self.rfile.read(size)
+        fields = dict(parse_qsl(url.query))
+        path_to_workspace = ""
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                request = json.loads(body or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("Send a JSON object with a path.")
+                fields = {**fields, **request}
+                path_to_audio = str(fields.get("path", ""))
+                if not os.path.isfile(path_to_audio):
+                    raise ValueError(f"No audio found at '{path_to_audio}'.")
+            else:
+                if size == 0:
+                    raise ValueError("Send a JSON body with a path, or the audio bytes.")
+                name = os.path.basename(str(fields.get("filename", "upload.audio")))
+                path_to_workspace = create_workspace()
+                path_to_audio = f"{path_to_workspace}/{name}"
+                with open(path_to_audio, "wb") as f:
+                    f.write(body)
+                    f.close()
+            job = make_job(path_to_audio, fields)
+        except ValueError as e:
+            release_workspace(path_to_workspace)
+            return self.reply(400, {"error": str(e)})
+
+        # QUEUE, THEN WAIT FOR A WORKER
+        with SERVICE["cond"]:
+            full = len(SERVICE["pending"]) >= SERVICE["queue_size"]
+            if not full:
+                SERVICE["pending"].append(job)
+                SERVICE["cond"].notify_all()
+        try:
+            if full:
+                return self.reply(503, {"error": "Queue is full. Try again later."})
+            job["event"].wait()
+            self.reply(*job["response"])
+        finally:
+            release_workspace(path_to_workspace)
+
+    def reply(self, status, data):
+        content = json.dumps(data, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 503:
+            self.send_header("Retry-After", "5")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        print(f"[LKL|VERBOSE] {self.address_string()} {format % args}")
+
+
+# ---------------------
+# ASSISTIVE FUNCTIONS
+# ...
+def make_job(path_to_audio, fields):
+    """F(x) merges request fields into the service defaults. Raises ValueError
+    for settings LOKAL does not know.
+    """
+    from scripts.batch import make_HPs
+    from scripts.utils import FAMILIES, MODEL_SIZES, TYPES, calc_audio_length
+
+    defaults = SERVICE["settings"]
+    family = str(fields.get("family", defaults["family"]))
+    model_size = str(fields.get("model", defaults["model"]))
+    approach = str(fields.get("approach", defaults["approach"]))
+    language = str(fields.get("language", defaults["language"]))
+    if family not in FAMILIES.values():
+        raise ValueError(f"Family must be one of {list(FAMILIES.values())}.")
+    if model_size not in MODEL_SIZES[family]:
+        raise ValueError(f"Model size for {family} must be one of {MODEL_SIZES[family]}.")
+    if approach not in TYPES:
+        raise ValueError(f"Approach must be one of {TYPES}.")
+
+    # Settings in the exact order the GUI uses
+    settings = {
+        **defaults,
+        "path_to_audio": path_to_audio,
+        "family": family,
+        "model": model_size,
+        "approach": approach,
+        "language": language if language.upper() == "AUTO" else language.lower(),
+        "timestamps_on": str(fields.get("timestamps", defaults["timestamps_on"])).lower()
+        in ["1", "true", "yes"],
+    }
+
+    # Hyper-parameters: request values, else the service's
+    try:
+        HPs = make_HPs(
+            approach,
+            float(fields.get("min_duration_on", SERVICE["HPs"].get("min_duration_on", 1.5))),
+            float(fields.get("min_duration_off", SERVICE["HPs"].get("min_duration_off", 0.5))),
+            str(fields.get("speakers", SERVICE["HPs"].get("speaker_num", "AUTO"))),
+        )
+    except (TypeError, ValueError):
+        raise ValueError("Hyper-parameters must be numbers (speakers may be AUTO).")
+
+    # Batching key: only short simple-mode clips sharing model, language and prompt,
+    # for families that really decode clips together (others would just queue them
+    # behind one worker)
+    key = None
+    if approach == "simple" and SERVICE["batch_max"] > 1 and batches_clips(family):
+        try:
+            seconds = calc_audio_length(path_to_audio)
+        except Exception:
+            seconds = float("inf")
+        if seconds <= SERVICE["batch_max_s"]:
+            key = (family, model_size, settings["language"], settings["gpu_on"], settings["path_to_prompt"])
+
+    return {
+        "settings": settings,
+        "HPs": HPs,
+        "filename": os.path.basename(path_to_audio).rsplit(".", 1)[0],
+        "key": key,
+        "event": threading.Event(),
+        "response": None,
+    }
+
+
+def batches_clips(family):
+    """F(x) tells whether a family transcribes several clips in one pass:
+    HF pipelines do, Faster Whisper from 1.1 (batched pipeline), Whisper does not.
+    """
+    if family.endswith("_hf"):
+        return True
+    if family == "systran":
+        try:
+            from faster_whisper import BatchedInferencePipeline
+
+            return True
+        except ImportError:
+            return False
+    return False
+
+
+def to_segments(result, approach):
+    """F(x) turns a transcript (see transcription_job) into JSON segments:
+    start, end and text, plus speaker for diarisation (whose turns end where
+    the next one starts).
+    """
+    if approach == "simple":
+        return [
+            {"start": s["start"], "end": s.get("end"), "text": s["text"].strip()}
+            for s in result["segments"]
+        ]
+    LINES = result["LINES"]
+    if approach == "segmentation":
+        return [{"start": l[0], "end": l[1], "text": l[2].strip()} for l in LINES]
+    return [
+        {
+            "speaker": l[0].strip(),
+            "start": l[1],
+            "end": LINES[i + 1][1] if i + 1 < len(LINES) else None,
+            "text": l[2].strip(),
+        }
+        for i, l in enumerate(LINES)
+    ]
+
+
+def main(argv=None):
+    """F(x) parses command line arguments and starts the service."""
+
+    # FUNCTION IMPORTS
+    import argparse
+    from scripts.batch import make_HPs, make_settings
+    from scripts.utils import FAMILIES, MODEL_SIZES, TYPES
+
+    # ARGUMENTS
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.service",
+        description="LOKAL: local HTTP transcription service.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (keep it local)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="requests transcribed at the same time (one model copy each)")
+    parser.add_argument("--queue-size", type=int, default=8, help="requests allowed to wait; more get HTTP 503")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per worker (0 = share cores evenly)")
+    parser.add_argument("--max-upload-mb", type=float, default=512)
+    parser.add_argument("--batch-max", type=int, default=8, help="short clips transcribed in one batch (1 = no batching)")
+    parser.add_argument("--batch-wait-ms", type=float, default=50, help="how long a worker waits for clips to batch")
+    parser.add_argument("--batch-max-seconds", type=float, default=60, help="longer audios are never batched")
+    parser.add_argument("--family", default="systran", choices=list(FAMILIES.values()))
+    parser.add_argument("--model", default="tiny", help="default model size, e.g. tiny, base, small")
+    parser.add_argument("--approach", default="simple", choices=TYPES)
+    parser.add_argument("--language", default="AUTO")
+    parser.add_argument("--timestamps", action="store_true")
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--min-duration-on", type=float, default=1.5, help="segmentation: ignore short segments (s)")
+    parser.add_argument("--min-duration-off", type=float, default=0.5, help="segmentation/diarisation: ignore short pauses (s)")
+    parser.add_argument("--speakers", default="AUTO", help="diarisation: number of speakers")
+    parser.add_argument("--batch-size", type=int, default=1, help="segments or 30s windows decoded together")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not fill the on-disk cache")
+    parser.add_argument("--accept-terms", action="store_true", help="accept LOKAL's terms & conditions")
+    args = parser.parse_args(argv)
+
+    # CHECKS
+    if not args.accept_terms:
+        parser.error("You need to accept the terms and conditions (--accept-terms).")
+    if args.model not in MODEL_SIZES[args.family]:
+        parser.error(f"Model size for {args.family} must be one of {MODEL_SIZES[args.family]}.")
+
+    # DEFAULTS (same shape as the GUI)
+    language = args.language if args.language.upper() == "AUTO" else args.language.lower()
+    settings = make_settings(
+        args.family, args.model, args.approach, language, args.timestamps, args.gpu
+    )
+    HPs = make_HPs(
+        args.approach, args.min_duration_on, args.min_duration_off, args.speakers
+    )
+    opts = {"batch_size": args.batch_size, "cache": not args.no_cache}
+
+    # RUN
+    serve(
+        settings,
+        HPs,
+        args.host,
+        args.port,
+        max(1, args.workers),
+        max(1, args.queue_size),
+        args.threads,
+        args.max_upload_mb,
+        max(1, args.batch_max),
+        args.batch_wait_ms,
+        args.batch_max_seconds,
+        opts,
+    )
+    return 0
+
+
+# ---------------------
+# NAME:MAIN?
+# ...
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
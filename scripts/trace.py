@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Per-stage traces of transcription jobs: where time and memory go.
+Each stage (decode, segmentation/diarisation, split, model load, segment
+transcription, joining, writing) records wall time, CPU time, peak RSS
+and audio seconds processed. Once a job ends, its trace is written to
+~/LOKAL_traces (LOKAL_TRACE_DIR) twice: as JSON and in Chrome's trace-event
+format (open it in chrome://tracing or ui.perfetto.dev). Only the latest
+traces are kept (LOKAL_TRACES_KEEP, 50 by default); older ones are deleted.
+
+Notes:
+  - CPU time is the whole process's during a stage (model libraries
+    compute in threads of their own), so concurrent jobs inflate it.
+  - Peak RSS is the process's high-water mark when a stage ends.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+TRACES_DIR = os.environ.get(
+    "LOKAL_TRACE_DIR", os.path.join(os.path.expanduser("~"), "LOKAL_traces")
+)
+
+# Number of traces (jobs) kept on disk. Override with LOKAL_TRACES_KEEP.
+KEEP = {"traces": int(os.environ.get("LOKAL_TRACES_KEEP", 50))}
+
+# Trace of the job each thread works for: thread id -> trace
+ACTIVE = {}
+
+
+# ---------------------
+# TRACE LIFECYCLE
+# ...
+def start_trace(job, audio_seconds=0.0):
+    """F(x) starts the trace of a job and ties it to the calling thread"""
+    trace = {
+        "job": job,
+        "audio_s": audio_seconds,
+        "started": time.time(),
+        "t0": time.perf_counter(),
+        "cpu0": time.process_time(),
+        "spans": [],
+        "lock": threading.Lock(),
+    }
+    adopt(trace)
+    return trace
+
+
+def current():
+    """F(x) returns the trace of the calling thread's job (None if untraced)"""
+    return ACTIVE.get(threading.get_ident())
+
+
+def adopt(trace):
+    """F(x) makes helper threads (e.g. replicas) record into a job's trace"""
+    if trace is not None:
+        ACTIVE[threading.get_ident()] = trace
+
+
+def leave():
+    """F(x) unties the calling thread from its trace"""
+    ACTIVE.pop(threading.get_ident(), None)
+
+
+def finish_trace(trace, done=1):
+    """F(x) writes the trace as JSON and Chrome trace events, prints a
+    real-time-factor summary and unties the thread. Returns both paths.
+    """
+    leave()
+    wall = time.perf_counter() - trace["t0"]
+    report = {
+        "job": trace["job"],
+        "done": done,
+        "started": trace["started"],
+        "audio_s": trace["audio_s"],
+        "wall_s": wall,
+        "cpu_s": time.process_time() - trace["cpu0"],
+        "rtf": wall / trace["audio_s"] if trace["audio_s"] > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": summary(trace),
+        "spans": trace["spans"],
+    }
+
+    # CONSOLE SUMMARY
+    slowest = sorted(report["stages"].items(), key=lambda s: -s[1]["wall_s"])[:3]
+    stages = ", ".join(f"{name} {stage['wall_s']:.1f}s" for name, stage in slowest)
+    speed = (
+        f"RTF {report['rtf']:.2f}, {1 / report['rtf']:.1f}x real time"
+        if report["rtf"]
+        else "RTF n/a"
+    )
+    print(
+        f"[LKL|MSG] {trace['audio_s']:.0f}s of audio in {wall:.1f}s ({speed}). Slowest: {stages}.\n"
+    )
+
+    # FILES
+    try:
+        os.makedirs(TRACES_DIR, exist_ok=True)
+        name = "".join(c if c.isalnum() or c in "-_" else "_" for c in trace["job"])
+        stem = os.path.join(TRACES_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        with open(stem + ".json", "w") as f:
+            json.dump(report, f, indent=1, default=float)
+            f.close()
+        with open(stem + ".trace.json", "w") as f:
+            json.dump(chrome_events(trace), f, default=float)
+            f.close()
+        print(f"[LKL|VERBOSE] Trace: {stem}.json")
+        rotate()
+        return stem + ".json", stem + ".trace.json"
+    except Exception as e:
+        print(f"[LKL|VERBOSE] Could not write trace: {e}")
+        return None, None
+
+
+def rotate():
+    """F(x) deletes the oldest traces, keeping the latest KEEP["traces"] jobs.
+    A job's trace is its .json report plus its .trace.json events.
+    """
+    stems = {}
+    for name in os.listdir(TRACES_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(TRACES_DIR, name)
+        try:
+            modified = os.stat(path).st_mtime
+        except OSError:
+            continue
+        stem = path[: -len(".trace.json")] if name.endswith(".trace.json") else path[: -len(".json")]
+        stems[stem] = max(stems.get(stem, 0.0), modified)
+
+    oldest_first = sorted(stems, key=lambda stem: stems[stem])
+    for stem in oldest_first[: max(0, len(stems) - KEEP["traces"])]:
+        for extension in [".json", ".trace.json"]:
+            try:
+                os.remove(stem + extension)
+            except OSError:
+                pass
+
+
+# ---------------------
+# STAGES
+# ...
+@contextmanager
+def span(name, audio_seconds=0.0, **args):
+    """F(x) records one stage of the calling thread's job (no-op if untraced)"""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        record = {
+            "name": name,
+            "start_s": start - trace["t0"],
+            "wall_s": time.perf_counter() - start,
+            "cpu_s": time.process_time() - cpu,
+            "peak_rss_mb": peak_rss_mb(),
+            "audio_s": audio_seconds,
+            "thread": threading.get_ident(),
+            "args": args,
+        }
+        with trace["lock"]:
+            trace["spans"].append(record)
+
+
+def summary(trace):
+    """F(x) adds up spans per stage: count, wall, CPU, audio seconds, peak RSS"""
+    stages = {}
+    with trace["lock"]:
+        for record in trace["spans"]:
+            stage = stages.setdefault(
+                record["name"],
+                {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "audio_s": 0.0, "peak_rss_mb": 0.0},
+            )
+            stage["count"] += 1
+            stage["wall_s"] += record["wall_s"]
+            stage["cpu_s"] += record["cpu_s"]
+            stage["audio_s"] += record["audio_s"]
+            stage["peak_rss_mb"] = max(stage["peak_rss_mb"], record["peak_rss_mb"] or 0.0)
+    return stages
+
+
+def chrome_events(trace):
+    """F(x) converts spans into Chrome trace-event format (complete events)"""
+    pid = os.getpid()
+    with trace["lock"]:
+        events = [
+            {
+                "name": record["name"],
+                "cat": "lokal",
+                "ph": "X",
+                "ts": record["start_s"] * 1e6,
+                "dur": record["wall_s"] * 1e6,
+                "pid": pid,
+                "tid": record["thread"],
+                "args": {
+                    "cpu_s": record["cpu_s"],
+                    "peak_rss_mb": record["peak_rss_mb"],
+                    "audio_s": record["audio_s"],
+                    **record["args"],
+                },
+            }
+            for record in trace["spans"]
+        ]
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"job": trace["job"]}}
+
+
+# ---------------------
+# ASSISTIVE FUNCTIONS
+# ...
+def peak_rss_mb():
+    """F(x) returns the process's peak resident memory in MB (None if unknown)"""
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    # Windows: no resource module, ask the OS directly
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):  # PROCESS_MEMORY_COUNTERS, as Windows defines it
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / 1024**2
+    except Exception:
+        return None
+
+
+def seconds_of(chunk, sr=16000):
+    """F(x) returns the length of an in-memory chunk or audio file (0 if unknown)"""
+    if not isinstance(chunk, str):
+        return len(chunk) / sr
+    try:
+        from scripts.utils import calc_audio_length
+
+        return calc_audio_length(chunk)
+    except Exception:
+        return 0.0
@@ -22,84 +22,117 @@ def hf_flow(
     gpu,
     mode,
     filename="",
-    path_to_temp_folder=""
+    path_to_temp_folder="",
+    pipe=None,
+    audio_chunks=None,
+    batch_size=1,
+    sort_by_length=True,
+    replicas=1,
+    beam_size=0,
 ):
-    """F(x) calls transcription model and writes result to TXT file"""
+    """F(x) calls transcription model and writes result to TXT file.
+    In loop mode, audio_chunks (in-memory slices) can replace the temp WAVs,
+    in which case a list with one text per chunk is returned instead.
+    In windows mode, a list of timestamped segments per chunk is returned.
+    Words mode works like simple mode but returns word-level timestamps.
+    Segments (loop) or 30s windows (simple) run batch_size at a time.
+    With replicas > 1, loop/windows batches are shared out across that many
+    pipeline replicas running in parallel threads.
+    beam_size above 0 swaps greedy decoding for beam search.
+    """
     
     # FUNCTION IMPORTS
     import os
-    from scripts.utils import calc_total_chunks
 
-    # NUMBER OF 30s AUDIO CHUNKS ACROSS ALL AUDIO
-    path = path_to_temp_folder if mode == "loop" else path_to_audio
-    calc_total_chunks(path, mode)
-
-    # KEY SETTINGS FOR HF PIPELINE
-    device, torch_dtype, model_id, processor = base(family, model_size, gpu, mode)
-
-    # HF PIPELINE
-    pipe = model_pipe(device, torch_dtype, model_id, processor, family)
+    # HF PIPELINE (warm from registry unless caller already holds a loaded pipeline)
+    if pipe is None:
+        pipe = get_pipe(family, model_size, gpu)
 
     # TRANSCRIBE
     # Announce transcription
     print("[LKL|MSG] Transcribing.")
 
     # Create array with list of all audio segments (loop) or single path to audio (simple)
-    audio_files = (
-        [f"{path_to_temp_folder}/{f}" for f in os.listdir(path_to_temp_folder) if f.endswith("wav")]
-        if mode == "loop"
-        else [path_to_audio]
-    )
+    # In-memory chunks (NumPy slices) replace the temp WAVs if given
+    if audio_chunks is not None:
+        audio_files = audio_chunks
+    else:
+        audio_files = (
+            [f"{path_to_temp_folder}/{f}" for f in os.listdir(path_to_temp_folder) if f.endswith("wav")]
+            if mode == "loop"
+            else [path_to_audio]
+        )
  
-    # Loop over audios in array, transcribe, and assemble result
-    current = 1
-    single_lang_models = ["distil-whisper_hf"]
-    for file in audio_files:
-        print(f"[LKL|VERBOSE] Transcribing audio segment {current} of {len(audio_files)}")
-        try:
-            # Transcribe segment
-            if family not in single_lang_models and language.lower() != "auto":
-                result = pipe(file, generate_kwargs={"language": language})
-            else:
-                result = pipe(file)
-
-            # Assemble result
-            segments = assemble_segments(result, mode)
-
-            # Write segment to TXT file if working on a loop
-            if mode == "loop":
-                try:
-                    with open(
-                        f"{file[:-4]}.txt", "w"
-                    ) as f:
-                        f.write(segments)
-                        f.close()
-                except Exception:
-                    pass
-            current += 1
-        except Exception as e:
-            print(f"[LKL|MSG] Error transcribing: {e}")
-
-    # Return segments (simple mode) or victory message (loop mode)
+    # Transcribe in batches (shortest first if sorting, so padding stays small)
+    # In simple mode, the pipeline batches the 30s windows of the single audio
+    load_replica = None
+    if replicas > 1 and mode in ["loop", "windows"]:
+        load_replica = lambda r: pipe if r == 0 else get_pipe(family, model_size, gpu, r)
+    results = transcribe_batches(
+        pipe, audio_files, family, language, batch_size, sort_by_length, mode,
+        replicas, load_replica, beam_size,
+    )
+
+    # Assemble results, in original order
+    texts = []
+    for file, result in zip(audio_files, results):
+        if result is None:
+            if audio_chunks is not None and mode in ["loop", "windows"]:
+                texts.append("" if mode == "loop" else [])
+            continue
+        segments = assemble_segments(result, mode)
+
+        # Keep segment in memory or write it to TXT file if working on a loop
+        if audio_chunks is not None and mode in ["loop", "windows"]:
+            texts.append(segments)
+        elif mode == "loop":
+            try:
+                with open(
+                    f"{file[:-4]}.txt", "w"
+                ) as f:
+                    f.write(segments)
+                    f.close()
+            except Exception:
+                pass
+
+    # Return segments (simple mode), in-memory results (loop/windows) or victory message
+    if audio_chunks is not None and mode in ["loop", "windows"]:
+        return texts
     return segments if mode != "loop" else f"[LKL|MSG] Finished transcription stage for {filename}"
 
 
 # ---------------------
 # ASSISTIVE FUNCTIONS
 # ...
-def base(family, model_size, gpu, mode):
+def get_pipe(family, model_size, gpu, replica=0):
+    """F(x) returns a warm HF pipeline from the registry, building it only if needed.
+    Replicas other than 0 are extra copies of the same pipeline for parallel runs.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.registry import fetch
+
+    # KEY: (family, size, device, compute type)
+    key = (family, model_size, "cuda:0" if gpu else "cpu", "auto")
+    if replica > 0:
+        key = key + (f"replica{replica}",)
+
+    return fetch(key, lambda: load_pipe(family, model_size, gpu))
+
+
+def load_pipe(family, model_size, gpu):
+    """F(x) builds a ready-to-use HF pipeline for a given family and size"""
+    device, torch_dtype, model_id, processor = base(family, model_size, gpu)
+    return model_pipe(device, torch_dtype, model_id, processor, family)
+
+
+def base(family, model_size, gpu):
     """Defines key settings for all pipelines"""
     
     # FUNCTION IMPORTS
     import torch
-    from transformers import AutoProcessor, logging
+    from transformers import AutoProcessor
     from scripts.assist import resource_path
-    from scripts.utils import HF_MODEL_PREFIXES
-
-    # ADJUST LOGGING SETTINGS TO ENABLE PROGRESS UPDATES IN TTKBOOTSTRAP
-    if mode == "simple":
-        logging.enable_explicit_format()
-        logging.set_verbosity_info()    
 
     # SETTINGS
     device = "cuda:0" if gpu else "cpu"
@@ -107,13 +140,7 @@ def base(family, model_size, gpu, mode):
 
     # PROCESSOR
     # Model location
-    prefix = HF_MODEL_PREFIXES[family]
-    suffix = ".en" if family == "distil-whisper_hf" else ""
-    model_id = (
-        f"{family.replace('_hf', '')}/{prefix}-{model_size}{suffix}"
-        if model_size != "large"
-        else f"{family.replace('_hf', '')}/{prefix}-{model_size}-v2"
-    )
+    model_id = hf_model_id(family, model_size)
     
     # Fetch processor
     processor = AutoProcessor.from_pretrained(model_id, cache_dir=f"./models/{family}")
@@ -122,6 +149,19 @@ def base(family, model_size, gpu, mode):
     return device, torch_dtype, model_id, processor
 
 
+def hf_model_id(family, model_size):
+    """Returns the HF Hub id of a family's model size"""
+    from scripts.utils import HF_MODEL_PREFIXES
+
+    prefix = HF_MODEL_PREFIXES[family]
+    suffix = ".en" if family == "distil-whisper_hf" else ""
+    return (
+        f"{family.replace('_hf', '')}/{prefix}-{model_size}{suffix}"
+        if model_size != "large"
+        else f"{family.replace('_hf', '')}/{prefix}-{model_size}-v2"
+    )
+
+
 def model_pipe(device, torch_dtype, model_id, processor, family):
     """Defines the model and pipeline for, both, simple and looped transcriptions"""
     
@@ -155,6 +195,102 @@ def model_pipe(device, torch_dtype, model_id, processor, family):
     return pipe
 
 
+def transcribe_batches(
+    pipe,
+    audio_files,
+    family,
+    language,
+    batch_size=1,
+    sort_by_length=True,
+    mode="simple",
+    replicas=1,
+    load_replica=None,
+    beam_size=0,
+):
+    """F(x) runs the pipeline over audio files or arrays, batch_size at a time.
+    If load_replica is given, batches are spread over that many replicas.
+    Returns one result per input, in input order (None if transcription failed).
+    """
+
+    # FUNCTION IMPORTS
+    from contextlib import nullcontext
+    from scripts.audio import SAMPLE_RATE
+    from scripts.progress import counting, follow, rows
+    from scripts.trace import seconds_of, span
+    from scripts.utils import calc_audio_length
+
+    # LANGUAGE
+    single_lang_models = ["distil-whisper_hf"]
+    kwargs = {"batch_size": max(1, batch_size)}
+    if mode == "words":
+        kwargs["return_timestamps"] = "word"
+    if family not in single_lang_models and language.lower() != "auto":
+        kwargs["generate_kwargs"] = {"language": language}
+    if beam_size > 0:
+        kwargs["generate_kwargs"] = {**kwargs.get("generate_kwargs", {}), "num_beams": beam_size}
+
+    # ORDER
+    def length(file):
+        return len(file) if not isinstance(file, str) else calc_audio_length(file)
+
+    order = list(range(len(audio_files)))
+    if sort_by_length and len(audio_files) > 1:
+        order.sort(key=lambda i: length(audio_files[i]))
+
+    # BATCHES
+    step = max(1, batch_size)
+    batches = [order[b : b + step] for b in range(0, len(order), step)]
+
+    def run_batch(pipe, batch):
+        print(
+            f"[LKL|VERBOSE] Transcribing audio segment {batch[0] + 1}{'' if len(batch) == 1 else f' (+{len(batch) - 1})'} of {len(audio_files)}"
+        )
+        # Arrays need a fresh dict per call (the pipeline consumes it)
+        inputs = [
+            audio_files[i]
+            if isinstance(audio_files[i], str)
+            else {"raw": audio_files[i], "sampling_rate": SAMPLE_RATE}
+            for i in batch
+        ]
+        seconds = sum(seconds_of(audio_files[i]) for i in batch)
+
+        # Progress: a whole audio (simple/words) moves on per batch of 30s windows,
+        # each adding 20s of new audio (the rest is the 5s strides on either side)
+        reach = follow(seconds)
+        windows = (
+            counting(pipe.model, "generate", lambda *args, **kwargs: 20.0 * rows(*args, **kwargs), reach)
+            if mode in ["simple", "words"]
+            else nullcontext()
+        )
+        with span("segment" if len(batch) == 1 else "segment_batch", seconds), windows:
+            outputs = pipe(inputs if len(inputs) > 1 else inputs[0], **kwargs)
+        reach()
+        return outputs if len(inputs) > 1 else [outputs]
+
+    # TRANSCRIBE (in parallel across replicas, or one batch after another)
+    if load_replica is not None and replicas > 1 and len(batches) > 1:
+        from scripts.parallel import run_parallel
+
+        outputs = run_parallel(batches, run_batch, load_replica, replicas)
+    else:
+        outputs = []
+        for batch in batches:
+            try:
+                outputs.append(run_batch(pipe, batch))
+            except Exception as e:
+                print(f"[LKL|MSG] Error transcribing: {e}")
+                outputs.append(None)
+
+    # BACK TO INPUT ORDER
+    results = [None] * len(audio_files)
+    for batch, output in zip(batches, outputs):
+        if output is not None:
+            for i, result in zip(batch, output):
+                results[i] = result
+
+    return results
+
+
 def assemble_segments(result, mode):
     """Writes transcription result to segments object (string or array)"""
 
@@ -166,7 +302,10 @@ def assemble_segments(result, mode):
         segments = result["text"]
     else:
         for line in result["chunks"]:
-            segments.append({"start": line["timestamp"][0], "text": line["text"]})
+            segment = {"start": line["timestamp"][0], "text": line["text"]}
+            if mode == "words":
+                segment["end"] = line["timestamp"][1]
+            segments.append(segment)
 
     # RETURN SEGMENTS
     return segments
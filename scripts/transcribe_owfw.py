@@ -25,17 +25,28 @@ def flow(
     path_to_prompt="",
     filename="",
     path_to_temp_folder="",
+    model=None,
+    audio_chunks=None,
+    batch_size=1,
+    replicas=1,
+    beam_size=0,
+    compute_type="",
 ):
-    """F(x) calls transcription model and writes result to TXT file"""
+    """F(x) calls transcription model and writes result to TXT file.
+    In loop mode, audio_chunks (in-memory slices) can replace the temp WAVs,
+    in which case a list with one text per chunk is returned instead.
+    In windows mode, a list of timestamped segments per chunk is returned.
+    Words mode works like simple mode but returns word-level timestamps.
+    With batch_size > 1, Faster Whisper decodes speech regions in batches.
+    With replicas > 1, loop/windows segments are shared out across that many
+    model replicas running in parallel threads.
+    beam_size (0 = LOKAL's default) and compute_type (Faster Whisper only,
+    "" = int8 on CPU, float16 on GPU) trade accuracy for speed.
+    """
 
     # FUNCTION IMPORTS
     import os
-    from scripts.assist import resource_path
-
-    if family == "systran":
-        from faster_whisper import WhisperModel
-    else:
-        import whisper
+    from scripts.trace import seconds_of, span
 
     # PROMPT
     if path_to_prompt != "":
@@ -44,44 +55,87 @@ def flow(
     else:
         prompt = "This prompt is a fallback, with a comma."
 
-    # MODEL
-    if family == "systran":
-        model = WhisperModel(
-            model_size,
-            device="cpu" if gpu is False else "cuda",
-            compute_type="int8" if gpu is False else "float16",
-            download_root=resource_path(f"./models/{family}"),
-        )
-    else:
-        model = whisper.load_model(
-            model_size, download_root=resource_path(f"./models/{family}")
-        )
-
     # TRANSCRIPTION
     # Announce transcription
     print("[LKL|MSG] Transcribing.")
 
     # Create array with list of all audio segments (loop) or single path to audio (simple)
-    audio_files = (
-        [
-            f"{path_to_temp_folder}/{f}"
-            for f in os.listdir(path_to_temp_folder)
-            if f.endswith("wav")
-        ]
-        if mode == "loop"
-        else [path_to_audio]
-    )
+    # In-memory chunks (NumPy slices) replace the temp WAVs if given
+    if audio_chunks is not None:
+        audio_files = audio_chunks
+    else:
+        audio_files = (
+            [
+                f"{path_to_temp_folder}/{f}"
+                for f in os.listdir(path_to_temp_folder)
+                if f.endswith("wav")
+            ]
+            if mode == "loop"
+            else [path_to_audio]
+        )
+
+    # MODEL (warm from registry unless caller already holds a loaded model)
+    # Faster Whisper replicas are all copies of their own (see below), so the
+    # main model is skipped when they will run instead of it
+    replicating = replicas > 1 and mode in ["loop", "windows"] and len(audio_files) > 1
+    batching = family == "systran" and batch_size > 1
+    if model is None and not (family == "systran" and replicating and not batching):
+        model = get_model(family, model_size, gpu, compute_type=compute_type)
+
+    # Batched Faster Whisper: speech from all audios is decoded together up front
+    batched = None
+    if batching:
+        with span("segment_batch", sum(seconds_of(file) for file in audio_files)):
+            batched = batched_base(
+                audio_files, language, gpu, model, mode, batch_size, beam_size
+            )
+
+    # Parallel replicas: segments pulled from a shared queue, results kept in order
+    parallel = None
+    if batched is None and replicating:
+        from scripts.parallel import run_parallel, threads_per_replica
+
+        def work(replica_model, file):
+            with span("segment", seconds_of(file)):
+                return base(
+                    file, language, gpu, replica_model, mode, prompt, family, beam_size
+                )
+
+        # Faster Whisper fixes its CPU threads at load time, so every replica (the
+        # first one too) is a copy loaded with its share of the cores. Whisper runs
+        # on torch, capped per replica by run_parallel, so replica 0 is the model itself.
+        def load_replica(r):
+            if family != "systran":
+                return model if r == 0 else get_model(family, model_size, gpu, threads, r)
+            return get_model(family, model_size, gpu, threads, r + 1, compute_type)
+
+        threads = threads_per_replica(replicas)
+        print(f"[LKL|VERBOSE] Running {replicas} model replicas, {threads} thread(s) each")
+        parallel = run_parallel(audio_files, work, load_replica, replicas)
 
     # Loop over audios in array, transcribe, and assemble result
     current_track = 1
-    for file in audio_files:
+    texts = []
+    for i, file in enumerate(audio_files):
         print(f"[LKL|VERBOSE] Audio segment {current_track} of {len(audio_files)}\n")
         current_track += 1
         try:
-            segments = base(file, language, gpu, model, mode, prompt, family)
+            if batched is not None:
+                segments = batched[i]
+            elif parallel is not None:
+                segments = parallel[i]
+                if segments is None:
+                    raise ValueError("segment failed in its replica")
+            else:
+                with span("segment", seconds_of(file)):
+                    segments = base(
+                        file, language, gpu, model, mode, prompt, family, beam_size
+                    )
 
-            # Write segment to TXT file if working on a loop
-            if mode == "loop":
+            # Keep segment in memory or write it to TXT file if working on a loop
+            if audio_chunks is not None and mode in ["loop", "windows"]:
+                texts.append(segments)
+            elif mode == "loop":
                 try:
                     with open(f"{file[:-4]}.txt", "w") as f:
                         f.write(segments)
@@ -91,8 +145,12 @@ def flow(
 
         except Exception as e:
             print(f"[LKL|MSG] Error transcribing: {e}")
+            if audio_chunks is not None and mode in ["loop", "windows"]:
+                texts.append("" if mode == "loop" else [])
 
-    # Return segments (simple mode) or victory message (loop mode)
+    # Return segments (simple mode), in-memory results (loop/windows) or victory message
+    if audio_chunks is not None and mode in ["loop", "windows"]:
+        return texts
     return (
         segments
         if mode != "loop"
@@ -103,52 +161,242 @@ def flow(
 # ---------------------
 # ASSISTIVE FUNCTIONS
 # ...
-def base(path_to_audio, language, gpu, model, mode, prompt, family):
+def get_model(family, model_size, gpu, cpu_threads=0, replica=0, compute_type=""):
+    """F(x) returns a warm model from the registry, loading it only if needed.
+    Replicas other than 0 are extra copies of the same model for parallel runs.
+    """
+
+    # FUNCTION IMPORTS
+    from scripts.registry import fetch
+
+    # KEY: (family, size, device, compute type)
+    if family == "systran":
+        key = (
+            family,
+            model_size,
+            "cpu" if gpu is False else "cuda",
+            compute_type or ("int8" if gpu is False else "float16"),
+        )
+    else:
+        key = (family, model_size, "auto", None)
+    if replica > 0:
+        key = key + (f"replica{replica}",)
+
+    return fetch(
+        key, lambda: load_model(family, model_size, gpu, cpu_threads, compute_type)
+    )
+
+
+def load_model(family, model_size, gpu, cpu_threads=0, compute_type=""):
+    """F(x) loads a Whisper or Faster Whisper model from local memory (or Internet)."""
+
+    # FUNCTION IMPORTS
+    from scripts.assist import resource_path
+
+    # LOAD
+    if family == "systran":
+        from faster_whisper import WhisperModel
+
+        model = WhisperModel(
+            model_size,
+            device="cpu" if gpu is False else "cuda",
+            compute_type=compute_type or ("int8" if gpu is False else "float16"),
+            cpu_threads=cpu_threads,
+            download_root=resource_path(f"./models/{family}"),
+        )
+    else:
+        import whisper
+
+        model = whisper.load_model(
+            model_size, download_root=resource_path(f"./models/{family}")
+        )
+
+    return model
+
+
+def base(path_to_audio, language, gpu, model, mode, prompt, family, beam_size=0):
     """F(x) calls Faster Whisper on an audio."""
 
     # FUNCTION IMPORTS
-    from scripts.utils import LANGUAGES
-    
+    from contextlib import nullcontext
+    from scripts.progress import counting, follow
+    from utils.langs import LANGS
+
+    # WORD-LEVEL TIMESTAMPS ONLY IF ASKED FOR (slower)
+    words = mode == "words"
+
+    # BEAMS: Faster Whisper defaults to 3 (CPU) or 5 (GPU), Whisper to greedy
+    beam = beam_size if beam_size > 0 else (3 if gpu is False else 5)
+    whisper_beam = {"beam_size": beam_size} if beam_size > 0 else {}
+
+    # PROGRESS: Faster Whisper segment by segment, Whisper one 30s window per decode
+    reach = follow(path_to_audio)
+    windows = (
+        counting(model, "decode", lambda *args, **kwargs: 30.0, reach)
+        if family != "systran"
+        else nullcontext()
+    )
+
     # TRANSCRIBE
-    if language.lower() == "auto":
-        if family == "systran":
-            result, _ = model.transcribe(
-                path_to_audio, beam_size=3 if gpu is False else 5, vad_filter=True
-            )
-        else:
-            result = model.transcribe(
-                path_to_audio, initial_prompt=prompt, fp16=gpu, verbose=True
-            )
-    else:
-        if family == "systran":
-            result, _ = model.transcribe(
-                path_to_audio,
-                beam_size=3 if gpu is False else 5,
-                vad_filter=True,
-                language=LANGUAGES[language],
-            )
+    with windows:
+        if language.lower() == "auto":
+            if family == "systran":
+                result, _ = model.transcribe(
+                    path_to_audio,
+                    beam_size=beam,
+                    vad_filter=True,
+                    word_timestamps=words,
+                )
+            else:
+                result = model.transcribe(
+                    path_to_audio,
+                    initial_prompt=prompt,
+                    fp16=gpu,
+                    verbose=True,
+                    word_timestamps=words,
+                    **whisper_beam,
+                )
         else:
-            result = model.transcribe(
-                path_to_audio,
-                initial_prompt=prompt,
-                language=language,
-                fp16=gpu,
-                verbose=True,
-            )
-            
+            if family == "systran":
+                result, _ = model.transcribe(
+                    path_to_audio,
+                    beam_size=beam,
+                    vad_filter=True,
+                    language=LANGS[language],
+                    word_timestamps=words,
+                )
+            else:
+                result = model.transcribe(
+                    path_to_audio,
+                    initial_prompt=prompt,
+                    language=language,
+                    fp16=gpu,
+                    verbose=True,
+                    word_timestamps=words,
+                    **whisper_beam,
+                )
+
     if family != "systran":
-        segments = result["text"] if mode == "loop" else result["segments"]
+        if words:
+            segments = [
+                {"start": w["start"], "end": w["end"], "text": w["word"]}
+                for line in result["segments"]
+                for w in line.get("words", [])
+            ]
+        else:
+            segments = result["text"] if mode == "loop" else result["segments"]
     else:
         segments = "" if mode == "loop" else []
         for line in result:
             print("[LKL|VERBOSE]", line.text)
             if mode == "loop":
                 segments = segments + line.text
+            elif words:
+                for w in line.words or []:
+                    segments.append({"start": w.start, "end": w.end, "text": w.word})
             else:
                 segments.append({"start": line.start, "text": line.text})
+            reach(line.end)
+    reach()
 
     return segments
 
+
+def batched_base(audio_files, language, gpu, model, mode, batch_size, beam_size=0):
+    """F(x) calls Faster Whisper's batched pipeline on one or many audios.
+    One audio (simple/words): VAD speech regions are packed into batches.
+    Many audios (loop/windows): audios are laid end to end and each one (cut
+    in pieces of up to 30s) becomes a clip, so short segments share batches.
+    Returns one result per audio, shaped like base() (None if the installed
+    faster-whisper has no batched pipeline). Failures are raised, not hidden.
+    """
+
+    # FUNCTION IMPORTS
+    import numpy as np
+    from scripts.progress import follow
+    from utils.langs import LANGS
+
+    # BATCHED PIPELINE NEEDS faster-whisper >= 1.1
+    try:
+        from faster_whisper import BatchedInferencePipeline
+        from faster_whisper.audio import decode_audio
+    except ImportError:
+        print("[LKL|MSG] Batched Faster Whisper needs faster-whisper 1.1 or later. Running sequentially.")
+        return None
+
+    # SETTINGS
+    pipeline = BatchedInferencePipeline(model=model)
+    beam = beam_size if beam_size > 0 else (3 if gpu is False else 5)
+    kwargs = {"beam_size": beam, "batch_size": batch_size}
+    if language.lower() != "auto":
+        kwargs["language"] = LANGS[language]
+
+    # SIMPLE/WORDS: A SINGLE AUDIO, VAD DECIDES THE CLIPS
+    try:
+        if mode in ["simple", "words"]:
+            reach = follow(audio_files[0])
+            result, _ = pipeline.transcribe(
+                audio_files[0], vad_filter=True, word_timestamps=mode == "words", **kwargs
+            )
+            segments = []
+            for line in result:
+                print("[LKL|VERBOSE]", line.text)
+                if mode == "words":
+                    for w in line.words or []:
+                        segments.append({"start": w.start, "end": w.end, "text": w.word})
+                else:
+                    segments.append({"start": line.start, "text": line.text})
+                reach(line.end)
+            reach()
+            return [segments]
+
+        # LOOP/WINDOWS: AUDIOS END TO END, ONE OR MORE CLIPS PER AUDIO
+        # Clip timestamps are sample indices; decoded segments come back in seconds
+        sr = 16000
+        audios = [
+            file if not isinstance(file, str) else decode_audio(file, sampling_rate=sr)
+            for file in audio_files
+        ]
+        starts = np.cumsum([0] + [len(a) for a in audios])
+        offsets = starts / sr
+        clips = []
+        for i, audio in enumerate(audios):
+            for start in range(0, len(audio), 30 * sr):
+                end = min(start + 30 * sr, len(audio))
+                if end - start > 0.1 * sr:
+                    clips.append({"start": int(starts[i] + start), "end": int(starts[i] + end)})
+        results = [[] for _ in audios]
+        if len(clips) > 0:
+            joined = np.concatenate(audios)
+            reach = follow(joined)
+            # Windows need segment timestamps to align text to their regions;
+            # loop segments are transcribed whole, one text each
+            result, _ = pipeline.transcribe(
+                joined,
+                vad_filter=False,
+                clip_timestamps=clips,
+                without_timestamps=mode == "loop",
+                **kwargs,
+            )
+
+            # MAP EACH DECODED SEGMENT BACK TO ITS AUDIO (start relative to it)
+            for line in result:
+                print("[LKL|VERBOSE]", line.text)
+                i = int(np.searchsorted(offsets, line.start, side="right")) - 1
+                i = min(max(i, 0), len(audios) - 1)
+                results[i].append({"start": line.start - offsets[i], "text": line.text})
+                reach(line.end)
+            reach()
+
+        # Loop mode only needs the text
+        if mode == "loop":
+            return ["".join(line["text"] for line in lines) for lines in results]
+        return results
+    except Exception as e:
+        print(f"[LKL|MSG] Batched transcription failed: {type(e).__name__}: {e}")
+        raise
+
+
 # ---------------------
 # NAME:MAIN?
 # ...
@@ -49,85 +49,79 @@ def log_free_run():
             config.license_status = "due"
 
 
-def calc_audio_length(path_to_audio):
-    """Determines lenght of any audio"""
-    from pydub import AudioSegment
+# Durations already probed: (path, size, mtime) -> seconds
+DURATIONS = {}
 
-    audio = AudioSegment.from_file(path_to_audio)
-    return audio.duration_seconds
 
+def calc_audio_length(path_to_audio):
+    """Determines lenght of any audio.
+    Reads headers (WAV, then libsndfile, then ffprobe) and only decodes the
+    full audio as a last resort. Results are cached per file.
+    """
+
+    # CACHE
+    stat = os.stat(path_to_audio)
+    key = (os.path.abspath(path_to_audio), stat.st_size, stat.st_mtime)
+    if key in DURATIONS:
+        return DURATIONS[key]
+
+    # HEADER PROBES, CHEAPEST FIRST
+    duration = None
+    for probe in [probe_wav_header, probe_soundfile, probe_ffprobe]:
+        try:
+            duration = probe(path_to_audio)
+        except Exception:
+            duration = None
+        if duration is not None:
+            break
 
-def calc_total_chunks(path, mode):
-    """Updates number of 30s segments in any given audio"""
+    # FULL DECODE AS A LAST RESORT
+    if duration is None:
+        duration = probe_full_decode(path_to_audio)
 
-    # Function imports
-    import math
-    from scripts.assist import resource_path
+    DURATIONS[key] = duration
+    return duration
 
-    # Count number of chunks
-    chunks = 0
-    if mode == "simple":
-        chunks = math.ceil(calc_audio_length(path) / 30)
-    else:
-        list = [f for f in os.listdir(path) if f.endswith("wav")]
-        for file in list:
-            chunks = chunks + math.ceil(calc_audio_length(f"{path}/{file}") / 30)
 
-    # Write chunk count to utils file
-    with open(resource_path("utils/chunks.txt"), "w") as f:
-        f.write(f"0,{str(chunks)}")
-        f.close()
+def probe_wav_header(path_to_audio):
+    """Reads duration from a PCM WAV header"""
+    import wave
 
+    if not path_to_audio.lower().endswith(".wav"):
+        return None
+    with wave.open(path_to_audio, "rb") as f:
+        return f.getnframes() / f.getframerate()
 
-def create_temp_folder():
-    """Creates folder to hold temp files needed for looped transcriptions"""
-    path_to_user = os.path.expanduser("~")
-    path_to_temp_folder = path_to_user + "/LOKAL_temp"
-    if not os.path.isdir(path_to_temp_folder):
-        os.makedirs(path_to_temp_folder)
 
-    return path_to_temp_folder
+def probe_soundfile(path_to_audio):
+    """Reads duration from headers of anything libsndfile knows (WAV, FLAC, OGG...)"""
+    import soundfile
 
+    return soundfile.info(path_to_audio).duration
 
-# ---------------------
-# AUDIO CONVERSION
-# Needed if main audio is not in .wav format
-# ...
-def convert_to_wav(filepath, filename):
 
-    # Function imports
-    from pydub import AudioSegment
+def probe_ffprobe(path_to_audio):
+    """Reads duration from container metadata using ffprobe (MP3, M4A...)"""
+    import subprocess
 
-    try:
-        source_folder = filepath.rpartition("/")[0]
-        new_filepath = (
-            source_folder + "/" + filename + "-wavcopyforLOKALtranscription" + ".wav"
-        )
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration"]
+    cmd += ["-of", "default=noprint_wrappers=1:nokey=1", path_to_audio]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
 
-        # Import file
-        audio = AudioSegment.from_file(filepath)
 
-        # Export file
-        audio.export(new_filepath, format="wav")
+def probe_full_decode(path_to_audio):
+    """Decodes the whole audio, for when nothing else works"""
+    from pydub import AudioSegment
 
-        return 1
-    except Exception:
-        return 0
+    audio = AudioSegment.from_file(path_to_audio)
+    return audio.duration_seconds
 
 
 def more_magic():
     return 2
 
 
-def delete_converted_wav(filepath):
-    if filepath.endswith("wav"):
-        try:
-            os.remove(filepath)
-            return "Succesfully deleted the temporary .wav version of audio.\n"
-        except Exception:
-            return "UNABLE TO DELETE CONVERTED AUDIO"
-
-
 def decode_license(license):
     from cryptography.fernet import Fernet
     from scripts.assist import resource_path
@@ -167,6 +161,30 @@ HF_MODEL_PREFIXES = {
 
 TYPES = ["simple", "segmentation", "diarisation"]
 
+# Performance options for transcription_flow (callers override any subset)
+DEFAULT_OPTS = {
+    "in_memory": False,  # decode once per job, share NumPy views across all stages
+    "memmap": False,  # back the decoded audio with a memory-mapped file (in_memory only)
+    "stream": False,  # simple mode: transcribe FFmpeg output block by block
+    "stream_block_s": 600,  # seconds per streamed block
+    "batch_size": 1,  # segments (or 30s windows) decoded together
+    "sort_by_length": True,  # batch segments of similar length together
+    "pack": False,  # segmentation: merge adjacent VAD regions into ~30s windows
+    "pack_window_s": 30.0,  # target window length when packing
+    "diarisation_strategy": "turns",  # "turns" (per-turn) or "one_pass" (word alignment)
+    "replicas": 1,  # loop mode: model copies transcribing segments in parallel threads
+    "shards": 1,  # simple mode: shards cut at quiet points and transcribed concurrently
+    "shard_overlap_s": 1.0,  # seconds each shard reaches into its neighbours
+    "cache": True,  # reuse intermediate results kept in ~/LOKAL_cache
+    "resume": True,  # loop mode: checkpoint segments in ~/LOKAL_jobs, resume after a crash
+    "workspace_ram": False,  # put the job's workspace in RAM (/dev/shm) if there is room
+    "workspace_quota_mb": 0,  # fail jobs writing more than this to their workspace (0 = no cap)
+    "write_txt": True,  # write the TXT transcript next to the audio
+    "trace": True,  # write per-stage timings and memory to ~/LOKAL_traces
+    "beam_size": 0,  # beams per decode (0 = 3 on CPU, 5 on GPU; greedy for Whisper and HF)
+    "compute_type": "",  # Faster Whisper weights: int8, float16, float32... ("" = int8 CPU, float16 GPU)
+}
+
 from utils.langs import LANGS
 LANGUAGES = {
     "systran": ["AUTO"] + sorted(LANGS),
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+v2. Nov 2024.
+@author: J.
+
+Workspaces: one private folder per job for temp audios, partial
+transcripts and memory-mapped audio, so several jobs can run at once.
+Workspaces live in ~/LOKAL_temp (LOKAL_WORKSPACE_DIR) or, if asked for and
+there is room, in RAM (/dev/shm). A lock file next to each workspace marks
+it as in use; workspaces whose lock is free were left behind by a crash
+and can be removed safely.
+
+LOKAL sticks to a functional programming paradigm.
+Any classes must be justified exceptionally well.
+
+Copyright (c) 2023 Jose A Bolanos.
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+# ---------------------
+# TOP-LEVEL IMPORTS
+# ...
+import os
+import shutil
+
+ROOT = os.environ.get(
+    "LOKAL_WORKSPACE_DIR", os.path.join(os.path.expanduser("~"), "LOKAL_temp")
+)
+RAM_ROOT = "/dev/shm/LOKAL_temp"
+
+# Workspaces of this process: path -> {"lock": FileLock, "quota_mb": MB}
+WORKSPACES = {}
+
+
+# ---------------------
+# LIFECYCLE
+# ...
+def create_workspace(ram=False, quota_mb=0, expected_mb=0):
+    """F(x) creates a unique, locked folder for one job and returns its path.
+    With ram, the folder goes to /dev/shm if it has room for expected_mb.
+    A quota_mb above 0 caps how much the job may write (see check_quota).
+    """
+
+    # FUNCTION IMPORTS
+    import tempfile
+    from filelock import FileLock
+
+    # LOCATION
+    root = RAM_ROOT if ram and ram_has_room(expected_mb) else ROOT
+    os.makedirs(root, exist_ok=True)
+
+    # UNIQUE FOLDER, LOCKED WHILE THE JOB RUNS
+    path = tempfile.mkdtemp(prefix=f"job-{os.getpid()}-", dir=root).replace("\\", "/")
+    lock = FileLock(path + ".lock")
+    lock.acquire()
+    WORKSPACES[path] = {"lock": lock, "quota_mb": quota_mb}
+    print(f"[LKL|VERBOSE] Workspace: {path}")
+
+    return path
+
+
+def release_workspace(path):
+    """F(x) deletes a job's workspace and frees its lock"""
+    if path == "":
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    entry = WORKSPACES.pop(path, None)
+    if entry is not None:
+        entry["lock"].release()
+    try:
+        os.remove(path + ".lock")
+    except OSError:
+        pass
+
+
+def release_all():
+    """F(x) deletes every workspace of this process (e.g. when LOKAL closes)"""
+    for path in list(WORKSPACES):
+        release_workspace(path)
+
+
+def cleanup_stale():
+    """F(x) deletes workspaces no running job holds, plus loose files left in
+    the root by older versions of LOKAL. Workspaces in use are left alone.
+    """
+    from filelock import FileLock, Timeout
+
+    for root in [ROOT.replace("\\", "/"), RAM_ROOT]:
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            path = f"{root}/{name}"
+            if name.endswith(".lock") or path in WORKSPACES:
+                continue
+            if os.path.isdir(path):
+                lock = FileLock(path + ".lock")
+                try:
+                    lock.acquire(timeout=0)
+                except Timeout:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                lock.release()
+                try:
+                    os.remove(path + ".lock")
+                except OSError:
+                    pass
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# ---------------------
+# SPACE
+# ...
+def check_quota(path):
+    """F(x) raises if a workspace holds more than its quota"""
+    entry = WORKSPACES.get(path)
+    if entry is None or entry["quota_mb"] <= 0:
+        return
+    used = usage_mb(path)
+    if used > entry["quota_mb"]:
+        raise OSError(
+            f"Workspace uses {used:.0f} MB, over its {entry['quota_mb']} MB quota."
+        )
+
+
+def usage_mb(path):
+    """F(x) adds up the size of all files in a folder"""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size / 1024**2
+
+
+def estimate_mb(seconds, memmap=False):
+    """F(x) guesses the temp space a job needs: 16 kHz float32 audio if it is
+    memory-mapped, else WAV chunks at up to 48 kHz stereo 16-bit
+    """
+    bytes_per_second = 16000 * 4 if memmap else 48000 * 2 * 2
+    return seconds * bytes_per_second / 1024**2
+
+
+def ram_has_room(expected_mb):
+    """F(x) checks /dev/shm exists and has room for expected_mb (plus margin)"""
+    if not os.path.isdir(os.path.dirname(RAM_ROOT)):
+        return False
+    try:
+        free_mb = shutil.disk_usage(os.path.dirname(RAM_ROOT)).free / 1024**2
+    except OSError:
+        return False
+    return free_mb > expected_mb * 1.2